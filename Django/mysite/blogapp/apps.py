@@ -4,3 +4,14 @@ from django.apps import AppConfig
 class BlogappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'blogapp'
+
+    def ready(self):
+        from mysite import fragment_cache
+        from . import signals
+        from .models import Article, Author, Category, Tag
+
+        fragment_cache.register(
+            Article,
+            depends_on={Author: ('name',), Category: ('name',), Tag: ('name',)},
+            m2m=(Article.tags.through,),
+        )
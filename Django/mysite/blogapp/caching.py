@@ -0,0 +1,25 @@
+from django.core.cache import cache
+from django.utils import timezone
+
+ARTICLES_VERSION_KEY = 'articles_version'
+ARTICLE_LIST_CACHE_TIMEOUT = 600
+
+
+def articles_version():
+    """
+    Version of everything the article list shows, used in its fragment cache key.
+
+    Replaced by the current time whenever an article, its tags or a related
+    name changes, which also covers deletes that leave MAX(modified_at)
+    unchanged. An evicted version restarts at the current time too, so
+    fragments cached under an older version are never served again.
+    """
+    version = cache.get(ARTICLES_VERSION_KEY)
+    if version is None:
+        cache.add(ARTICLES_VERSION_KEY, timezone.now().timestamp(), None)
+        version = cache.get(ARTICLES_VERSION_KEY)
+    return version
+
+
+def bump_articles_version():
+    cache.set(ARTICLES_VERSION_KEY, timezone.now().timestamp(), None)
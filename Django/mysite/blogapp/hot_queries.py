@@ -0,0 +1,14 @@
+from mysite.hot_queries import hot_query
+
+from .models import Article
+
+
+@hot_query('blogapp:articles_list')
+def articles_list():
+    return Article.objects.order_by('-pub_date', '-pk')[:11]
+
+
+@hot_query('blogapp:articles_by_category')
+def articles_by_category():
+    return Article.objects.filter(category_id=1).order_by('-pub_date', '-pk')[:11]
+
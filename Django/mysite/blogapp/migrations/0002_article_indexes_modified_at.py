@@ -0,0 +1,32 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:39
+
+from django.db import migrations, models
+
+
+def copy_pub_date(apps, schema_editor):
+    Article = apps.get_model('blogapp', 'Article')
+    Article.objects.update(modified_at=models.F('pub_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('blogapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copy_pub_date, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['pub_date', 'id'], name='article_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['category', 'pub_date', 'id'], name='article_category_pub_date_idx'),
+        ),
+    ]
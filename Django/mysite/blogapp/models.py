@@ -27,9 +27,16 @@ class Tag(models.Model):
 
 class Article(models.Model):
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='article_pub_date_idx'),
+            models.Index(fields=['category', 'pub_date', 'id'], name='article_category_pub_date_idx'),
+        ]
+
     title = models.CharField(max_length=200)
     content = models.TextField()
     pub_date = models.DateTimeField(auto_now_add=True, editable=True)
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
     author = models.ForeignKey(
         Author,
         on_delete=models.CASCADE,
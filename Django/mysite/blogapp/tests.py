@@ -1,3 +1,81 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from mysite.testing import QueryBudgetMixin
+
+from .caching import ARTICLES_VERSION_KEY, articles_version, bump_articles_version
+from .models import Article, Author, Category, Tag
+
+
+class ArticlesListViewTestCase(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(name='writer')
+        cls.news = Category.objects.create(name='news')
+        cls.other = Category.objects.create(name='other')
+        cls.tag = Tag.objects.create(name='django')
+        cls.articles = [
+            Article.objects.create(
+                title=f'Article {i}',
+                content='text',
+                author=cls.author,
+                category=cls.news if i % 2 else cls.other,
+            )
+            for i in range(15)
+        ]
+        cls.articles[0].tags.add(cls.tag)
+
+    def setUp(self):
+        cache.clear()
+
+    def titles(self, response):
+        return [article.title for article in response.context['articles']]
+
+    def test_cursor_pages_newest_first(self):
+        url = reverse('blogapp:articles_list')
+        response = self.client.get(url)
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(self.titles(response), [f'Article {i}' for i in range(14, 4, -1)])
+
+        response = self.client.get(url, {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual(self.titles(response), [f'Article {i}' for i in range(4, -1, -1)])
+
+        self.assertEqual(self.client.get(url, {'cursor': 'broken'}).status_code, 404)
+
+    def test_category_and_tag_filters(self):
+        response = self.client.get(reverse('blogapp:articles_by_category', kwargs={'category_id': self.news.pk}))
+        self.assertEqual(self.titles(response), [f'Article {i}' for i in range(13, 0, -2)])
+
+        response = self.client.get(reverse('blogapp:articles_by_tag', kwargs={'tag_id': self.tag.pk}))
+        self.assertEqual(self.titles(response), ['Article 0'])
+
+    def test_rendered_page_is_cached_until_an_article_changes(self):
+        url = reverse('blogapp:articles_list')
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertContains(response, 'Article 14')
+
+        self.articles[14].title = 'Renamed'
+        self.articles[14].save()
+        self.assertContains(self.client.get(url), 'Renamed')
+
+        self.articles[14].delete()
+        self.assertNotContains(self.client.get(url), 'Renamed')
+
+    def test_other_query_parameters_share_the_cached_page(self):
+        url = reverse('blogapp:articles_list')
+        self.client.get(url, {'x': 1})
+
+        with self.assertNumQueries(0):
+            response = self.client.get(url, {'x': 2})
+        self.assertContains(response, 'Article 14')
+
+    def test_evicted_version_does_not_go_back(self):
+        bump_articles_version()
+        version = articles_version()
+        cache.delete(ARTICLES_VERSION_KEY)
+        self.assertGreaterEqual(articles_version(), version)
@@ -5,4 +5,6 @@ app_name = 'blogapp'
 
 urlpatterns = [
     path('articles', ArticlesListView.as_view(), name='articles_list'),
+    path('articles/category/<int:category_id>', ArticlesListView.as_view(), name='articles_by_category'),
+    path('articles/tag/<int:tag_id>', ArticlesListView.as_view(), name='articles_by_tag'),
 ]
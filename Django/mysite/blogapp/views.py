@@ -1,15 +1,55 @@
+from django.shortcuts import get_object_or_404
+from django.http import Http404
+from django.utils.functional import SimpleLazyObject
 from django.views.generic import ListView
 
-from .models import Article
+from mysite.pagination import InvalidCursor, KeysetPaginator
+
+from .caching import ARTICLE_LIST_CACHE_TIMEOUT, articles_version
+from .models import Article, Category, Tag
 
 
 class ArticlesListView(ListView):
     template_name = 'blogapp/article_list.html'
     model = Article
-    queryset = (Article.objects
-                .defer('content')
-                .select_related('author', 'category')
-                .prefetch_related('tags')
-                )
     context_object_name = 'articles'
+    paginate_by = 10
+    ordering = ('-pub_date', '-pk')
+
+    def get_queryset(self):
+        queryset = (Article.objects
+                    .defer('content')
+                    .select_related('author', 'category')
+                    .prefetch_related('tags')
+                    )
+        self.category = self.tag = None
+        if 'category_id' in self.kwargs:
+            self.category = get_object_or_404(Category, pk=self.kwargs['category_id'])
+            queryset = queryset.filter(category=self.category)
+        if 'tag_id' in self.kwargs:
+            self.tag = get_object_or_404(Tag, pk=self.kwargs['tag_id'])
+            queryset = queryset.filter(tags=self.tag)
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        cursor = self.request.GET.get('cursor')
+        # Part of the fragment cache key, so other query parameters don't add entries.
+        self.cursor = cursor or ''
+        if cursor:
+            try:
+                paginator.decode_cursor(cursor)
+            except InvalidCursor as exc:
+                raise Http404(str(exc))
+        # Only evaluated when the template fragment is not cached.
+        page = SimpleLazyObject(lambda: paginator.get_page(cursor))
+        return paginator, page, SimpleLazyObject(lambda: page.object_list), True
 
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['category'] = self.category
+        context['tag'] = self.tag
+        context['cursor'] = self.cursor
+        context['cache_version'] = articles_version()
+        context['cache_timeout'] = ARTICLE_LIST_CACHE_TIMEOUT
+        return context
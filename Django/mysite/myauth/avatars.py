@@ -0,0 +1,103 @@
+"""
+Pre-sized avatar variants.
+
+Every uploaded avatar gets square WebP and JPEG copies in AVATAR_SIZES,
+written next to the original under ``thumbs/``. They are re-encoded from
+the pixels only, so EXIF data (camera, GPS position) is left behind.
+Variants are made when the avatar is uploaded, and on the first request
+for avatars that predate them or were removed from disk.
+"""
+import hashlib
+import io
+import os
+import posixpath
+import tempfile
+
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+# 128px (256px at 2x) on the profile pages, 64px (128px at 2x) in the users directory.
+AVATAR_SIZES = (64, 128, 256)
+
+AVATAR_FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'image/jpeg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+
+
+def avatar_version(name):
+    """
+    Short hash of the original's name; it changes with every upload.
+    """
+    return hashlib.md5(name.encode()).hexdigest()[:8]
+
+
+def variant_name(name, size, fmt):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, 'thumbs', f'{stem}_{size}.{fmt}')
+
+
+def render_variant(image, size, fmt):
+    """
+    Encode ``image`` cropped to a ``size`` square, without metadata.
+    """
+    pil_format, _, options = AVATAR_FORMATS[fmt]
+    image = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+    if pil_format == 'JPEG' and image.mode != 'RGB':
+        background = Image.new('RGB', image.size, 'white')
+        background.paste(image, mask=image.getchannel('A') if 'A' in image.getbands() else None)
+        image = background
+    buffer = io.BytesIO()
+    # Without exif= and icc_profile= Pillow writes no metadata.
+    image.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def _open_original(name, storage):
+    with storage.open(name, 'rb') as original:
+        image = Image.open(original)
+        # Decode JPEGs at a reduced scale, they are shrunk anyway.
+        image.draft('RGB', (max(AVATAR_SIZES) * 2, max(AVATAR_SIZES) * 2))
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA' if 'transparency' in image.info or 'A' in image.getbands() else 'RGB')
+        image.load()
+    return image
+
+
+def _write(storage, name, content):
+    # Write to a temporary file and rename, so a concurrent request never
+    # reads a partial variant.
+    path = storage.path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    try:
+        with open(fd, 'wb') as f:
+            f.write(content)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def generate_variants(name, sizes=AVATAR_SIZES, formats=tuple(AVATAR_FORMATS), force=False, storage=None):
+    """
+    Write the missing variants of the avatar ``name`` (all of them with
+    ``force``) and return the names written.
+    """
+    storage = storage or default_storage
+    wanted = [
+        (size, fmt, variant_name(name, size, fmt))
+        for size in sizes
+        for fmt in formats
+    ]
+    if not force:
+        wanted = [variant for variant in wanted if not storage.exists(variant[2])]
+    if not wanted:
+        return []
+    image = _open_original(name, storage)
+    for size, fmt, variant in wanted:
+        _write(storage, variant, render_variant(image, size, fmt))
+    return [variant for _, _, variant in wanted]
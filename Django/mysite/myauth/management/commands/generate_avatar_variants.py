@@ -0,0 +1,65 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from time import perf_counter
+
+import django
+from django.apps import apps
+from django.core.management import BaseCommand
+from django.db import connections
+from PIL import UnidentifiedImageError
+
+from ...avatars import generate_variants
+
+
+def _init_worker():
+    if not apps.ready:
+        # Spawned rather than forked workers start without Django.
+        django.setup()
+
+
+def _generate(name, force):
+    try:
+        return name, len(generate_variants(name, force=force)), None
+    except (FileNotFoundError, UnidentifiedImageError) as exc:
+        return name, 0, str(exc)
+
+
+class Command(BaseCommand):
+    """
+    Write the missing avatar variants of every profile, decoding the
+    originals in a pool of worker processes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=None, help='Defaults to the number of CPUs')
+        parser.add_argument('--force', action='store_true', help='Regenerate existing variants too')
+
+    def handle(self, *args, **options):
+        # Spawned workers import this module before _init_worker sets up
+        # Django, so models can't be imported at the top.
+        from ...models import Profile
+
+        names = list(
+            Profile.objects
+            .exclude(avatar='')
+            .exclude(avatar__isnull=True)
+            .values_list('avatar', flat=True)
+        )
+        # Forked workers must not share the parent's database connections.
+        connections.close_all()
+
+        started = perf_counter()
+        written = failed = 0
+        with ProcessPoolExecutor(options['workers'], initializer=_init_worker) as executor:
+            for name, count, error in executor.map(_generate, names, repeat(options['force']), chunksize=8):
+                written += count
+                if error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        elapsed = perf_counter() - started
+
+        self.stdout.write(
+            f'{len(names)} avatars, {written} variants written, {failed} failed '
+            f'in {elapsed:.2f}s ({len(names) / elapsed if elapsed else 0:.0f} avatars/s)'
+        )
+        self.stdout.write(self.style.SUCCESS('Avatar variants generated'))
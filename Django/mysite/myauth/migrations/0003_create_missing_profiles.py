@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.db import migrations
+
+
+def create_missing_profiles(apps, schema_editor):
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Profile = apps.get_model('myauth', 'Profile')
+    users = list(User.objects.filter(profile__isnull=True).values_list('pk', flat=True))
+    Profile.objects.bulk_create((Profile(user_id=pk) for pk in users), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('myauth', '0002_profile_avatar'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_profiles, migrations.RunPython.noop),
+    ]
@@ -1,10 +1,16 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from .avatars import avatar_version
+
 def profile_avatar_directory_path(instance: 'Profile', filename: str) -> str:
     return f'profile/profile_{instance.user.pk}/avatar/{filename}'
 
 class Profile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio =models.TextField(blank=True, max_length=500)
-    avatar = models.ImageField(null=True, blank=True, upload_to=profile_avatar_directory_path)
\ No newline at end of file
+    avatar = models.ImageField(null=True, blank=True, upload_to=profile_avatar_directory_path)
+
+    @property
+    def avatar_version(self):
+        return avatar_version(self.avatar.name) if self.avatar else ''
@@ -1,3 +1,134 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from PIL import Image
+
+from .avatars import AVATAR_FORMATS, AVATAR_SIZES, variant_name
+from .models import Profile
+
+
+def make_photo(size=(1200, 800)):
+    image = Image.new('RGB', size, 'red')
+    exif = Image.Exif()
+    exif[0x0110] = 'Test camera'  # Model
+    exif[0x0112] = 6  # Orientation: rotate 90 degrees
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class AvatarVariantsTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp()
+        cls.settings_override = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.settings_override.enable()
+
+        cls.user = User.objects.create_user(username='test-user-avatar', password='test-password')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.media_root)
+        super().tearDownClass()
+
+    def upload(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('myauth:new_avatar', kwargs={'pk': self.user.pk}), {
+            'bio': '',
+            'avatar': SimpleUploadedFile('photo.jpg', make_photo(), content_type='image/jpeg'),
+        })
+        self.assertEqual(response.status_code, 302)
+        return Profile.objects.get(user=self.user).avatar.name
+
+    def test_upload_writes_square_variants_without_exif(self):
+        name = self.upload()
+        for size in AVATAR_SIZES:
+            for fmt, (pil_format, _, _) in AVATAR_FORMATS.items():
+                with default_storage.open(variant_name(name, size, fmt)) as variant:
+                    image = Image.open(variant)
+                    self.assertEqual((image.format, image.size), (pil_format, (size, size)))
+                    self.assertFalse(image.getexif())
+
+        response = self.client.get(reverse('myauth:about-me'))
+        self.assertContains(response, '<picture>')
+        self.assertNotContains(response, Profile.objects.get(user=self.user).avatar.url)
+
+    def test_missing_variants_are_generated_on_request(self):
+        name = self.upload()
+        variant = variant_name(name, 128, 'webp')
+        default_storage.delete(variant)
+
+        profile = Profile.objects.get(user=self.user)
+        url = reverse('myauth:avatar', kwargs={'pk': self.user.pk, 'size': 128, 'fmt': 'webp'})
+        response = self.client.get(url, {'v': profile.avatar_version})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/webp')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(Image.open(io.BytesIO(b''.join(response.streaming_content))).size, (128, 128))
+        self.assertTrue(default_storage.exists(variant))
+
+        url = reverse('myauth:avatar', kwargs={'pk': self.user.pk, 'size': 1000, 'fmt': 'webp'})
+        self.assertEqual(self.client.get(url).status_code, 404)
+
+    def test_backfill_command(self):
+        name = self.upload()
+        for size in AVATAR_SIZES:
+            default_storage.delete(variant_name(name, size, 'jpeg'))
+
+        out = StringIO()
+        call_command('generate_avatar_variants', workers=2, stdout=out)
+        self.assertIn(f'{len(AVATAR_SIZES)} variants written', out.getvalue())
+        for size in AVATAR_SIZES:
+            self.assertTrue(default_storage.exists(variant_name(name, size, 'jpeg')))
+
+
+class UsersDirectoryTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        for i in range(60):
+            User.objects.create_user(username=f'directory-{i:02}')
+        User.objects.create_user(username='Directory-upper')
+        cls.viewer = User.objects.create_user(username='test-user-directory', password='test-password')
+
+    def test_users_get_a_profile(self):
+        self.assertFalse(User.objects.filter(profile__isnull=True).exists())
+
+    def test_pages_and_prefix_search(self):
+        url = reverse('myauth:list_users')
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        users = list(response.context['list_users'])
+        expected = list(User.objects.order_by('username', 'pk').values_list('username', flat=True)[:50])
+        self.assertEqual([user.username for user in users], expected)
+
+        response = self.client.get(url, {'q': 'directory-'})
+        usernames = [user.username for user in response.context['list_users']]
+        self.assertEqual(usernames, [f'directory-{i:02}' for i in range(50)])
+        response = self.client.get(url, {'q': 'directory-', 'cursor': response.context['page_obj'].next_cursor})
+        usernames = [user.username for user in response.context['list_users']]
+        self.assertEqual(usernames, [f'directory-{i:02}' for i in range(50, 60)])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    def test_about_user_reads_only(self):
+        self.client.force_login(self.viewer)
+        other = User.objects.get(username='directory-01')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('myauth:user_details', kwargs={'pk': other.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
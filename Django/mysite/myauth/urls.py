@@ -8,6 +8,7 @@ from .views import (
     UserUpdateAvatarView,
     UsersListView,
     AboutUserView,
+    AvatarVariantView,
 )
 
 app_name = "myauth"
@@ -27,4 +28,5 @@ urlpatterns = [
     path("about-user/<int:pk>/", AboutUserView.as_view(), name="user_details"),
 
     path("new_avatar/<int:pk>/", UserUpdateAvatarView.as_view(), name="new_avatar"),
+    path("avatar/<int:pk>/<int:size>.<str:fmt>", AvatarVariantView.as_view(), name="avatar"),
 ]
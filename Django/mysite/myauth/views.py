@@ -2,11 +2,20 @@ from django.contrib.auth import authenticate, login
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.http import FileResponse, Http404
 from django.urls import reverse_lazy
+from django.utils.cache import patch_cache_control
+from django.views import View
 from django.views.generic import TemplateView, CreateView, UpdateView, ListView, DetailView
 from django.contrib.auth.views import LogoutView
 from django.shortcuts import reverse, get_object_or_404, redirect
+from PIL import UnidentifiedImageError
 
+from mysite.pagination import InvalidCursor, KeysetPaginator
+
+from .avatars import AVATAR_FORMATS, AVATAR_SIZES, avatar_version, generate_variants, variant_name
 from .models import Profile
 
 
@@ -16,8 +25,8 @@ class RegisterView(CreateView):
     success_url = reverse_lazy('myauth:about-me')
 
     def form_valid(self, form):
+        # The profile is created by the post_save signal.
         response = super().form_valid(form)
-        Profile.objects.create(user=self.object)
 
         username, password = form.cleaned_data.get('username'), form.cleaned_data.get('password1')
 
@@ -62,28 +71,95 @@ class UserUpdateAvatarView(LoginRequiredMixin, UpdateView):
         user = get_object_or_404(User, pk=self.kwargs['pk'])
         return user.profile
 
+    def form_valid(self, form):
+        response = super().form_valid(form)
+        if 'avatar' in form.changed_data and self.object.avatar:
+            generate_variants(self.object.avatar.name, force=True)
+        return response
+
     def get_success_url(self):
         return reverse('myauth:about-me')
 
 
+class AvatarVariantView(View):
+    """
+    Serve a pre-sized avatar, generating the missing variants on first request.
+
+    URLs carry ?v= with the avatar version, so browsers may keep them for good.
+    """
+
+    def get(self, request, pk, size, fmt):
+        if size not in AVATAR_SIZES or fmt not in AVATAR_FORMATS:
+            raise Http404
+        profile = get_object_or_404(Profile.objects.only('avatar'), user_id=pk)
+        if not profile.avatar:
+            raise Http404
+        try:
+            generate_variants(profile.avatar.name)
+        except (FileNotFoundError, UnidentifiedImageError):
+            raise Http404
+        response = FileResponse(
+            default_storage.open(variant_name(profile.avatar.name, size, fmt), 'rb'),
+            content_type=AVATAR_FORMATS[fmt][1],
+        )
+        if request.GET.get('v') == avatar_version(profile.avatar.name):
+            patch_cache_control(response, public=True, max_age=365 * 24 * 60 * 60, immutable=True)
+        return response
+
+
 class UsersListView(ListView):
+    """
+    Users directory in username order, ?q= narrows it to a username prefix.
+    """
     template_name = 'myauth/users.html'
     model = User
     context_object_name = 'list_users'
+    paginate_by = 50
+    ordering = ('username', 'pk')
+
+    def get_queryset(self):
+        queryset = (
+            User.objects
+            .select_related('profile')
+            .only('pk', 'username', 'profile__user', 'profile__avatar')
+        )
+        self.query = self.request.GET.get('q', '').strip()
+        if self.query:
+            queryset = queryset.filter(username__startswith=self.query)
+            if connection.vendor == 'sqlite':
+                # SQLite's LIKE can't use the username index, a range can. The
+                # BINARY collation sorts by code point, so the range holds exactly
+                # the names with this prefix and LIKE only rechecks them. Under a
+                # linguistic collation the range would miss names; PostgreSQL's
+                # LIKE uses the varchar_pattern_ops index Django adds for unique
+                # varchar columns instead.
+                last = ord(self.query[-1])
+                queryset = queryset.filter(username__gte=self.query)
+                if last < 0x10FFFF:
+                    queryset = queryset.filter(username__lt=self.query[:-1] + chr(last + 1))
+        return queryset
+
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        try:
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['query'] = self.query
+        return context
 
 
 class AboutUserView(LoginRequiredMixin, DetailView):
     template_name = "myauth/about-user.html"
     model = User
     context_object_name = 'user_detail'
+    queryset = User.objects.select_related('profile')
 
     def dispatch(self, request, *args, **kwargs):
-
-        try:
-            profile = request.user.profile
-        except Profile.RelatedObjectDoesNotExist:
-            profile = Profile.objects.create(user=request.user)
-
         if self.kwargs['pk'] == request.user.pk:
             return redirect('myauth:about-me')
 
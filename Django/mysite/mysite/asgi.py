@@ -3,14 +3,30 @@ ASGI config for mysite project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Requests go through mysite.urls_asgi, which routes the product list and
+detail pages, the user orders export and the feed to async versions of
+their views; mysite.wsgi keeps serving the sync ones. To serve them
+concurrently from one worker run the ASGI application with uvicorn
+workers under gunicorn:
+
+    pip install uvicorn-worker
+    gunicorn mysite.asgi:application -k uvicorn_worker.UvicornWorker --workers 4 --bind 0.0.0.0:8000
+
+Sync views and the sync ORM calls made while rendering templates run in a
+thread per request, so keep CONN_MAX_AGE (or the PostgreSQL pool) enabled.
+Compare both modes with ``manage.py benchmark_asgi``.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
 """
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+
+from mysite.handlers import AsyncViewsASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
 
-application = get_asgi_application()
+django.setup(set_prefix=False)
+application = AsyncViewsASGIHandler()
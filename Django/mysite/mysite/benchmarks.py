@@ -0,0 +1,74 @@
+import re
+from contextlib import contextmanager
+from statistics import mean
+from time import perf_counter
+
+from django.db import transaction
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    return {
+        'count': len(samples),
+        'mean_ms': round(mean(samples), 3) if samples else 0.0,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p95_ms': round(percentile(samples, 95), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+    }
+
+
+def time_calls(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = perf_counter()
+        func()
+        samples.append((perf_counter() - started) * 1000)
+    return samples
+
+
+@contextmanager
+def rolled_back(using=None):
+    """
+    Run a benchmark against the configured database and throw the rows away.
+    """
+    with transaction.atomic(using=using):
+        yield
+        transaction.set_rollback(True, using=using)
+
+
+_SERVER_TIMING_QUERIES = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+def server_timing_queries(header):
+    """
+    Query count from the Server-Timing header set by RequestMetricsMiddleware.
+    """
+    match = _SERVER_TIMING_QUERIES.search(header or '')
+    return int(match.group(1)) if match else None
+
+
+def compare_reports(baseline, report, threshold):
+    """
+    Routes of ``report`` that regressed against ``baseline``: p95 latency
+    worse by more than the ``threshold`` fraction, more queries, or a
+    different status. Returns ``(route, metric, before, after)`` tuples.
+    """
+    regressions = []
+    for route, after in report['routes'].items():
+        before = baseline['routes'].get(route)
+        if before is None:
+            continue
+        if after['status'] != before['status']:
+            regressions.append((route, 'status', before['status'], after['status']))
+        if after['p95_ms'] > before['p95_ms'] * (1 + threshold):
+            regressions.append((route, 'p95_ms', before['p95_ms'], after['p95_ms']))
+        if None not in (before['queries'], after['queries']) and after['queries'] > before['queries']:
+            regressions.append((route, 'queries', before['queries'], after['queries']))
+    return regressions
@@ -0,0 +1,285 @@
+"""
+Two-tier cache: a per-process LRU in front of a cache shared by all workers.
+
+L1 answers repeated reads without touching the disk and is bounded by the
+pickled size of its values. L2 is a file-based cache, so every gunicorn
+worker sees the same entries with no extra services to run. Writes and
+deletes go to both tiers; other processes only notice them once their own
+L1 copy expires, which L1_TIMEOUT keeps to a few seconds.
+"""
+import os
+import pickle
+import random
+import re
+import socket
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.cache.backends.filebased import FileBasedCache
+
+STATS_INDEX_KEY = 'tiered-cache-stats'
+STATS_TIMEOUT = 24 * 60 * 60
+
+
+def key_prefix(key):
+    return re.split(r'[:.]', str(key), maxsplit=1)[0]
+
+
+class FileCache(FileBasedCache):
+    """
+    FileBasedCache that lists the cache directory to cull only every
+    ``CULL_EVERY`` writes instead of on each one, and whose add() is atomic
+    across processes so it can be used as a lock.
+    """
+
+    def __init__(self, dir, params):
+        super().__init__(dir, params)
+        options = params.get('OPTIONS', {})
+        self._cull_every = int(options.get('CULL_EVERY', 100))
+        self._writes = 0
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._createdir()
+        fname = self._key_to_file(key, version)
+        self._cull()
+        fd, tmp_path = tempfile.mkstemp(dir=self._dir)
+        try:
+            with open(fd, 'wb') as f:
+                self._write_content(f, timeout, value)
+            # Retry once if the existing file turns out to be expired (has_key removes it).
+            for _ in range(2):
+                try:
+                    # Unlike the rename in set(), link() fails if the file exists.
+                    os.link(tmp_path, fname)
+                    return True
+                except FileExistsError:
+                    if self.has_key(key, version):
+                        return False
+            return False
+        finally:
+            os.remove(tmp_path)
+
+    def _cull(self):
+        self._writes += 1
+        if self._writes % self._cull_every == 0:
+            super()._cull()
+
+
+class LRU:
+    """
+    Thread-safe LRU of pickled values, evicting by total size in bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, pickled = entry
+            if expires < time.monotonic():
+                self._pop(key)
+                return None
+            self._data.move_to_end(key)
+            return pickled
+
+    def set(self, key, pickled, timeout):
+        if len(pickled) > self.max_bytes:
+            self.delete(key)
+            return
+        with self._lock:
+            self._pop(key)
+            self._data[key] = (time.monotonic() + timeout, pickled)
+            self.size += len(pickled)
+            while self.size > self.max_bytes:
+                self._pop(next(iter(self._data)))
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.size = 0
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.size -= len(entry[1])
+
+    def __len__(self):
+        return len(self._data)
+
+
+class TieredCache(BaseCache):
+    """
+    Cache backend with LOCATION as the L2 directory and these OPTIONS:
+
+    L1_MAX_BYTES    size of the in-process LRU (default 16 MiB)
+    L1_TIMEOUT      seconds an L1 copy may be served (default 5)
+    JITTER          timeouts are shortened by up to this fraction (default 0.1)
+    STATS_INTERVAL  seconds between stats flushes to L2 (default 30)
+
+    Other options (MAX_ENTRIES, CULL_FREQUENCY, CULL_EVERY) are passed to L2.
+    """
+
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l1 = LRU(int(options.get('L1_MAX_BYTES', 16 * 1024 * 1024)))
+        self.l1_timeout = float(options.get('L1_TIMEOUT', 5))
+        self.jitter = float(options.get('JITTER', 0.1))
+        self.stats_interval = float(options.get('STATS_INTERVAL', 30))
+        self.l2 = FileCache(location, {
+            'TIMEOUT': params.get('TIMEOUT', 300),
+            'KEY_PREFIX': params.get('KEY_PREFIX', ''),
+            'VERSION': params.get('VERSION', 1),
+            'KEY_FUNCTION': params.get('KEY_FUNCTION'),
+            'OPTIONS': {
+                name: value for name, value in options.items()
+                if name in ('MAX_ENTRIES', 'CULL_FREQUENCY', 'CULL_EVERY')
+            },
+        })
+        self.stats = Counter()
+        self.stats_id = f'{socket.gethostname()}:{os.getpid()}'
+        self._stats_flushed = time.monotonic()
+        self._stats_lock = threading.Lock()
+
+    def jittered(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        if timeout is None:
+            return None
+        remaining = timeout - time.time()
+        # Spread expiries of keys written together so they aren't recomputed together.
+        return max(0, remaining * (1 - random.uniform(0, self.jitter)))
+
+    def _count(self, key, event):
+        with self._stats_lock:
+            self.stats[(key_prefix(key), event)] += 1
+            due = time.monotonic() - self._stats_flushed >= self.stats_interval
+        if due:
+            self.flush_stats()
+
+    def _remember(self, key, value, version, timeout=None):
+        l1_timeout = self.l1_timeout if timeout is None else min(timeout, self.l1_timeout)
+        pickled = pickle.dumps(value, self.pickle_protocol)
+        self.l1.set(self.make_and_validate_key(key, version), pickled, l1_timeout)
+
+    def get(self, key, default=None, version=None):
+        pickled = self.l1.get(self.make_and_validate_key(key, version))
+        if pickled is not None:
+            self._count(key, 'l1_hit')
+            return pickle.loads(pickled)
+        sentinel = object()
+        value = self.l2.get(key, sentinel, version)
+        if value is sentinel:
+            self._count(key, 'miss')
+            return default
+        self._count(key, 'l2_hit')
+        self._remember(key, value, version)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        missing = []
+        for key in keys:
+            pickled = self.l1.get(self.make_and_validate_key(key, version))
+            if pickled is None:
+                missing.append(key)
+            else:
+                self._count(key, 'l1_hit')
+                found[key] = pickle.loads(pickled)
+        sentinel = object()
+        for key in missing:
+            value = self.l2.get(key, sentinel, version)
+            if value is sentinel:
+                self._count(key, 'miss')
+            else:
+                self._count(key, 'l2_hit')
+                self._remember(key, value, version)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.jittered(timeout)
+        self.l2.set(key, value, timeout, version)
+        self._remember(key, value, version, timeout)
+        self._count(key, 'set')
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        for key, value in data.items():
+            self.set(key, value, timeout, version)
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        timeout = self.jittered(timeout)
+        added = self.l2.add(key, value, timeout, version)
+        if added:
+            self._remember(key, value, version, timeout)
+            self._count(key, 'set')
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version))
+        return self.l2.touch(key, self.jittered(timeout), version)
+
+    def delete(self, key, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version))
+        return self.l2.delete(key, version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.delete(key, version)
+
+    def has_key(self, key, version=None):
+        if self.l1.get(self.make_and_validate_key(key, version)) is not None:
+            return True
+        return self.l2.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        self.l1.delete(self.make_and_validate_key(key, version))
+        return self.l2.incr(key, delta, version)
+
+    def clear(self):
+        self.l1.clear()
+        self.l2.clear()
+
+    def flush_stats(self):
+        """
+        Write this process's counters to L2 for the cache_stats command.
+        """
+        with self._stats_lock:
+            snapshot = {f'{prefix}|{event}': count for (prefix, event), count in self.stats.items()}
+            self._stats_flushed = time.monotonic()
+        snapshot['l1_bytes'] = self.l1.size
+        snapshot['l1_entries'] = len(self.l1)
+        self.l2.set(f'{STATS_INDEX_KEY}:{self.stats_id}', snapshot, STATS_TIMEOUT)
+        index = self.l2.get(STATS_INDEX_KEY) or set()
+        if self.stats_id not in index:
+            self.l2.set(STATS_INDEX_KEY, index | {self.stats_id}, STATS_TIMEOUT)
+
+    def collect_stats(self):
+        """
+        Counters of every process that flushed in the last day, keyed by process.
+        """
+        index = self.l2.get(STATS_INDEX_KEY) or set()
+        keys = {f'{STATS_INDEX_KEY}:{stats_id}': stats_id for stats_id in index}
+        return {keys[key]: snapshot for key, snapshot in self.l2.get_many(keys).items()}
+
+    def reset_stats(self):
+        with self._stats_lock:
+            self.stats.clear()
+        for stats_id in self.l2.get(STATS_INDEX_KEY) or ():
+            self.l2.delete(f'{STATS_INDEX_KEY}:{stats_id}')
+        self.l2.delete(STATS_INDEX_KEY)
@@ -0,0 +1,157 @@
+"""
+Per-row template fragment cache keyed by model versions.
+
+A registered model gets a version per row, replaced on every save, and a
+version per model for the models its rows display (depends_on), replaced
+when one of their listed fields changes. A fragment key combines them
+with the active language, so an edit re-renders only the affected rows
+and a fragment stored at older versions is treated as a miss.
+"""
+import hashlib
+import time
+from collections import Counter
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save
+from django.utils.translation import get_language
+
+FRAGMENT_CACHE_TIMEOUT = 60 * 60
+
+_registry = {}
+stats = Counter()
+
+
+def _row_key(label, pk):
+    return f'fragver:{label}:{pk}'
+
+
+def _model_key(label):
+    return f'fragver:{label}'
+
+
+def _new_version():
+    return time.time_ns()
+
+
+def bump_rows(model, pks):
+    label = model._meta.label_lower
+    version = _new_version()
+    cache.set_many({_row_key(label, pk): version for pk in pks}, FRAGMENT_CACHE_TIMEOUT)
+
+
+def bump_model(model):
+    cache.set(_model_key(model._meta.label_lower), _new_version(), FRAGMENT_CACHE_TIMEOUT)
+
+
+def register(model, depends_on=None, m2m=()):
+    """
+    Track versions for ``model`` rows.
+
+    ``depends_on`` maps other models shown in a row to the fields that
+    matter (None for any save); ``m2m`` lists through models whose changes
+    affect the row.
+    """
+    label = model._meta.label_lower
+    depends_on = depends_on or {}
+    _registry[label] = [dependency._meta.label_lower for dependency in depends_on]
+
+    def row_saved(sender, instance, **kwargs):
+        bump_rows(model, [instance.pk])
+
+    post_save.connect(row_saved, sender=model, weak=False, dispatch_uid=f'fragment_cache:{label}')
+
+    for dependency, fields in depends_on.items():
+        uid = f'fragment_cache:{label}:{dependency._meta.label_lower}'
+        # Values of ``fields`` as loaded, to tell a plain save() that changed none of them.
+        loaded = f'_fragment_loaded_{label.replace(".", "_")}'
+
+        def dependency_loaded(sender, instance, fields=fields, loaded=loaded, **kwargs):
+            # Read __dict__ so deferred fields are not loaded for every instance.
+            setattr(instance, loaded, [instance.__dict__.get(field) for field in fields])
+
+        def dependency_saved(sender, instance, created, update_fields=None, fields=fields, loaded=loaded, **kwargs):
+            if fields is None:
+                bump_model(sender)
+                return
+            if update_fields is not None and not set(fields) & set(update_fields):
+                return
+            values = [instance.__dict__.get(field) for field in fields]
+            # A new row is in no fragment yet.
+            if not created and values != getattr(instance, loaded, None):
+                bump_model(sender)
+            setattr(instance, loaded, values)
+
+        def dependency_deleted(sender, **kwargs):
+            bump_model(sender)
+
+        if fields is not None:
+            post_init.connect(dependency_loaded, sender=dependency, weak=False, dispatch_uid=uid)
+        post_save.connect(dependency_saved, sender=dependency, weak=False, dispatch_uid=uid)
+        post_delete.connect(dependency_deleted, sender=dependency, weak=False, dispatch_uid=uid)
+
+    for through in m2m:
+        def related_changed(sender, instance, action, pk_set, **kwargs):
+            if not action.startswith('post_'):
+                return
+            if isinstance(instance, model):
+                bump_rows(model, [instance.pk])
+            elif pk_set:
+                bump_rows(model, pk_set)
+            else:
+                # Reverse clear(): the affected rows are unknown.
+                bump_model(model)
+
+        m2m_changed.connect(related_changed, sender=through, weak=False, dispatch_uid=f'fragment_cache:{label}:m2m')
+
+
+def _current_versions(keys, found):
+    missing = {key: _new_version() for key in keys if key not in found}
+    if missing:
+        # A fresh version, never 0, so an evicted version can't revive old fragments.
+        cache.set_many(missing, FRAGMENT_CACHE_TIMEOUT)
+    return tuple(found.get(key) or missing[key] for key in keys)
+
+
+def model_versions(label, memo=None):
+    """
+    Versions of ``label`` and the models its rows depend on.
+
+    Pass a dict as ``memo`` to read them once per render instead of per row.
+    """
+    if label not in _registry:
+        raise ImproperlyConfigured(f'{label} is not registered with mysite.fragment_cache')
+    if memo is not None and label in memo:
+        return memo[label]
+    keys = [_model_key(label)] + [_model_key(dependency) for dependency in _registry[label]]
+    versions = _current_versions(keys, cache.get_many(keys))
+    if memo is not None:
+        memo[label] = versions
+    return versions
+
+
+def get_or_render(obj, render, vary_on=(), memo=None):
+    """
+    Return the cached fragment for ``obj`` or store the output of ``render()``.
+
+    Fragments are stored with the versions they were rendered at, so a row
+    costs a single cache round trip for its version and content.
+    """
+    label = obj._meta.label_lower
+    versions = model_versions(label, memo)
+    vary = hashlib.md5(':'.join(str(value) for value in vary_on).encode()).hexdigest()
+    row_key = _row_key(label, obj.pk)
+    # Fragments hold translated text and language-prefixed URLs.
+    key = f'fragment:{label}:{obj.pk}:{get_language()}:{vary}'
+
+    found = cache.get_many([row_key, key])
+    versions += _current_versions([row_key], found)
+    cached = found.get(key)
+    if cached is not None and cached[0] == versions:
+        stats[f'{label}:hit'] += 1
+        return cached[1]
+
+    stats[f'{label}:miss'] += 1
+    content = render()
+    cache.set(key, (versions, content), FRAGMENT_CACHE_TIMEOUT)
+    return content
@@ -0,0 +1,14 @@
+from django.core.handlers.asgi import ASGIHandler
+
+ASGI_URLCONF = 'mysite.urls_asgi'
+
+
+class AsyncViewsASGIHandler(ASGIHandler):
+    """
+    ASGIHandler resolving requests with mysite.urls_asgi, where some shop
+    routes have async views.
+    """
+
+    async def get_response_async(self, request):
+        request.urlconf = ASGI_URLCONF
+        return await super().get_response_async(request)
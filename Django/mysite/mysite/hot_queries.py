@@ -0,0 +1,21 @@
+"""
+Registry of the query shapes our busiest pages depend on.
+
+Apps list theirs in a ``hot_queries`` module; the explain_hot_queries
+command imports those modules and checks that every query uses an index.
+"""
+from django.utils.module_loading import autodiscover_modules
+
+HOT_QUERIES = {}
+
+
+def hot_query(name):
+    def decorator(func):
+        HOT_QUERIES[name] = func
+        return func
+    return decorator
+
+
+def autodiscover():
+    autodiscover_modules('hot_queries')
+    return HOT_QUERIES
@@ -0,0 +1,269 @@
+"""
+Seeded synthetic data for load testing.
+
+Rows are generated in chunks of ``batch_size``. Each chunk draws from its
+own random.Random seeded with (seed, kind, chunk number), so the data is
+the same whether the chunks run in one process or in a pool of them.
+Rows are built before the chunk's transaction starts, which then only
+holds the write lock for the inserts. Everything is written with
+bulk_create(), which skips model signals; the caller rebuilds the
+denormalized aggregates and the search index afterwards.
+"""
+import random
+from array import array
+from contextlib import contextmanager, nullcontext
+from bisect import bisect
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Lock
+from decimal import Decimal
+from itertools import accumulate
+from time import perf_counter
+
+import django
+from django.apps import apps
+from django.contrib.auth.hashers import make_password
+from django.db import connection, connections, transaction
+
+WORDS = (
+    'red green blue fresh ripe sweet sour crisp juicy dried organic local '
+    'apple banana orange mango lemon lime grape melon peach pear plum cherry '
+    'berry kiwi fig date nut seed bean rice bread cheese milk honey tea coffee'
+).split()
+
+PASSWORD = 'load-data'
+
+
+def _rng(seed, kind, chunk):
+    return random.Random(f'{seed}:{kind}:{chunk}')
+
+
+def _words(rng, count):
+    return ' '.join(rng.choices(WORDS, k=count))
+
+
+class Plan:
+    """
+    Sizes, seed and the pks drawn from by later stages.
+
+    Passed to every worker, so it only holds plain data.
+    """
+
+    def __init__(self, seed, users, products, orders, authors, categories, tags, articles,
+                 lines_per_order=3, zipf_s=1.1, batch_size=5000):
+        self.seed = seed
+        self.sizes = {
+            'users': users, 'products': products, 'orders': orders, 'authors': authors,
+            'categories': categories, 'tags': tags, 'articles': articles,
+        }
+        self.lines_per_order = lines_per_order
+        self.zipf_s = zipf_s
+        self.batch_size = batch_size
+        self.pks = {}
+        self.password = None
+
+    def chunks(self, kind):
+        size = self.sizes[kind]
+        return [(kind, chunk, start, min(self.batch_size, size - start))
+                for chunk, start in enumerate(range(0, size, self.batch_size))]
+
+
+_plan = None
+_popularity = None
+_write_lock = None
+
+
+def _init_worker(plan, write_lock=None):
+    global _plan, _popularity, _write_lock
+    if not apps.ready:
+        # Spawned rather than forked workers start without Django.
+        django.setup()
+    _plan = plan
+    _popularity = None
+    _write_lock = write_lock
+
+
+@contextmanager
+def _writing():
+    """
+    Transaction of one chunk's inserts. SQLite has a single writer, so
+    workers take turns through the lock instead of timing out on it.
+    """
+    with _write_lock or nullcontext(), transaction.atomic():
+        yield
+
+
+def _insert_lines(through, columns, rows):
+    """
+    Insert many-to-many rows with executemany(), without building model instances.
+    """
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {quote(through._meta.db_table)} ({", ".join(map(quote, columns))}) VALUES (%s, %s)',
+            rows,
+        )
+    return len(rows)
+
+
+def _popular_products():
+    """
+    Cumulative Zipf weights over the products in a seeded random order, so
+    popularity does not follow the pks.
+    """
+    global _popularity
+    if _popularity is None:
+        pks = list(_plan.pks['products'])
+        random.Random(f'{_plan.seed}:popularity').shuffle(pks)
+        weights = accumulate(1 / rank ** _plan.zipf_s for rank in range(1, len(pks) + 1))
+        _popularity = pks, list(weights)
+    return _popularity
+
+
+def _users(rng, start, count):
+    from django.contrib.auth.models import User
+    from myauth.models import Profile
+
+    users = [
+        User(
+            username=f'load-{_plan.seed}-{start + i}',
+            first_name=rng.choice(WORDS).capitalize(),
+            password=_plan.password,
+        )
+        for i in range(count)
+    ]
+    bios = [_words(rng, rng.randint(0, 12)) for _ in range(count)]
+    with _writing():
+        User.objects.bulk_create(users)
+        Profile.objects.bulk_create(Profile(user_id=user.pk, bio=bio) for user, bio in zip(users, bios))
+    return count * 2
+
+
+def _products(rng, start, count):
+    from shopapp.models import Product
+
+    users = _plan.pks['users']
+    products = [
+        Product(
+            name=f'{rng.choice(WORDS)} {start + i}'[:15],
+            description=_words(rng, rng.randint(5, 30)),
+            price=Decimal(rng.randint(100, 50000)) / 100,
+            discount=rng.choice((0, 0, 0, 5, 10, 25)),
+            archived=rng.random() < 0.02,
+            created_by_id=users[rng.randrange(len(users))],
+        )
+        for i in range(count)
+    ]
+    with _writing():
+        Product.objects.bulk_create(products)
+    return count
+
+
+def _orders(rng, start, count):
+    from shopapp.models import Order
+
+    users = _plan.pks['users']
+    products, weights = _popular_products()
+    total = weights[-1]
+    orders = [
+        Order(
+            user_id=users[rng.randrange(len(users))],
+            delivery_address=f'ul {rng.choice(WORDS).capitalize()}, d {rng.randint(1, 200)}',
+            promo=rng.choice(('', '', '', 'SALE10')),
+        )
+        for _ in range(count)
+    ]
+    picked = [
+        {
+            products[min(bisect(weights, rng.random() * total), len(products) - 1)]
+            for _ in range(rng.randint(1, _plan.lines_per_order * 2 - 1))
+        }
+        for _ in range(count)
+    ]
+    with _writing():
+        Order.objects.bulk_create(orders)
+        lines = _insert_lines(
+            Order.products.through, ('order_id', 'product_id'),
+            [(order.pk, pk) for order, pks in zip(orders, picked) for pk in pks],
+        )
+    return count + lines
+
+
+def _names(model, field):
+    def create(rng, start, count):
+        model_class = apps.get_model(model)
+        rows = [model_class(**{field: f'{rng.choice(WORDS)} {start + i}'}) for i in range(count)]
+        with _writing():
+            model_class.objects.bulk_create(rows)
+        return count
+    return create
+
+
+def _articles(rng, start, count):
+    from blogapp.models import Article
+
+    authors, categories, tags = _plan.pks['authors'], _plan.pks['categories'], list(_plan.pks['tags'])
+    articles = [
+        Article(
+            title=_words(rng, rng.randint(3, 8)).capitalize(),
+            content=_words(rng, rng.randint(50, 300)),
+            author_id=authors[rng.randrange(len(authors))],
+            category_id=categories[rng.randrange(len(categories))],
+        )
+        for _ in range(count)
+    ]
+    picked = [rng.sample(tags, min(len(tags), rng.randint(0, 4))) for _ in range(count)]
+    with _writing():
+        Article.objects.bulk_create(articles)
+        lines = _insert_lines(
+            Article.tags.through, ('article_id', 'tag_id'),
+            [(article.pk, tag_id) for article, tag_ids in zip(articles, picked) for tag_id in tag_ids],
+        )
+    return count + lines
+
+
+STAGES = {
+    'users': ('auth.User', _users),
+    'products': ('shopapp.Product', _products),
+    'orders': ('shopapp.Order', _orders),
+    'authors': ('blogapp.Author', _names('blogapp.Author', 'name')),
+    'categories': ('blogapp.Category', _names('blogapp.Category', 'name')),
+    'tags': ('blogapp.Tag', _names('blogapp.Tag', 'name')),
+    'articles': ('blogapp.Article', _articles),
+}
+
+
+def _run_chunk(task):
+    kind, chunk, start, count = task
+    return STAGES[kind][1](_rng(_plan.seed, kind, chunk), start, count)
+
+
+def generate(plan, workers=1, report=None):
+    """
+    Create the rows of ``plan`` stage by stage and return the rows written.
+
+    With ``workers`` > 1 the chunks of each stage run in a process pool.
+    ``report(kind, rows, seconds)`` is called after every stage.
+    """
+    plan.password = make_password(PASSWORD)
+    written = 0
+    for kind, (label, _) in STAGES.items():
+        model = apps.get_model(label)
+        before = model.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+        started = perf_counter()
+        tasks = plan.chunks(kind)
+        if workers > 1 and len(tasks) > 1:
+            # Workers open their own connections; forked ones must not share ours.
+            connections.close_all()
+            write_lock = Lock() if connection.vendor == 'sqlite' else None
+            with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(plan, write_lock)) as executor:
+                rows = sum(executor.map(_run_chunk, tasks))
+        else:
+            _init_worker(plan)
+            rows = sum(map(_run_chunk, tasks))
+        elapsed = perf_counter() - started
+        written += rows
+        if report:
+            report(kind, rows, elapsed)
+        # Later stages pick related rows by pk from these.
+        plan.pks[kind] = array('q', model.objects.filter(pk__gt=before).order_by('pk').values_list('pk', flat=True))
+    return written
@@ -0,0 +1,108 @@
+import logging
+from contextlib import ExitStack
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+log = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    connection.execute_wrapper() that counts queries and their time.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += perf_counter() - started
+
+
+def count_queries(counter, stack):
+    """
+    Wrap this thread's connections with counter until stack is closed.
+    """
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(counter))
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, DB time, total time and response size of every request.
+
+    Metrics are logged on the ``mysite.middleware`` logger, as a warning when
+    the view is over its REQUEST_BUDGETS entry and at DEBUG otherwise. They
+    are also sent in a Server-Timing
+    header and kept on ``response.request_metrics`` for tests.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = QueryCounter()
+        started = perf_counter()
+        with ExitStack() as stack:
+            count_queries(counter, stack)
+            response = self.get_response(request)
+        return self.record(request, response, counter, perf_counter() - started)
+
+    async def __acall__(self, request):
+        counter = QueryCounter()
+        started = perf_counter()
+        stack = ExitStack()
+        # The async ORM queries from the request's thread-sensitive thread,
+        # which has its own connections.
+        await sync_to_async(count_queries)(counter, stack)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.record(request, response, counter, perf_counter() - started)
+
+    def record(self, request, response, counter, total):
+        match = request.resolver_match
+        metrics = {
+            'view': match.view_name if match else None,
+            'path': request.path,
+            'status': response.status_code,
+            'queries': counter.count,
+            'db_ms': round(counter.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            # Streaming bodies are produced after this point.
+            'size': None if response.streaming else len(response.content),
+        }
+        response.request_metrics = metrics
+
+        if settings.REQUEST_METRICS_SERVER_TIMING:
+            response['Server-Timing'] = (
+                f'db;dur={metrics["db_ms"]};desc="{metrics["queries"]} queries", '
+                f'total;dur={metrics["total_ms"]}'
+            )
+
+        budget = settings.REQUEST_BUDGETS.get(metrics['view'])
+        over = budget and [
+            key for key, limit in budget.items()
+            if metrics.get(key) is not None and metrics[key] > limit
+        ]
+        if over:
+            log.warning('%s over budget (%s): %s', metrics['view'], ', '.join(over), metrics, extra=metrics)
+        else:
+            log.debug('%s %s', metrics['view'], metrics, extra=metrics)
+        return response
@@ -0,0 +1,350 @@
+import base64
+import json
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+APPROXIMATE_COUNT_CAP = 1000
+
+
+class InvalidCursor(InvalidPage):
+    pass
+
+
+class KeysetPage:
+    """
+    One page of a keyset paginated queryset.
+
+    Mirrors the parts of django.core.paginator.Page used by templates,
+    but navigates with opaque cursors instead of page numbers.
+    """
+
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Cursor paginator that seeks on the ordering columns instead of using OFFSET.
+
+    ``ordering`` must identify a row uniquely (end it with 'pk'); every field
+    may be prefixed with '-' for descending order. Page cost stays the same
+    however deep the page is, and inserted rows never shift existing pages.
+    """
+
+    def __init__(self, queryset, ordering, per_page):
+        self.queryset = queryset
+        self.ordering = tuple(ordering)
+        self.per_page = int(per_page)
+        self.fields = [
+            (name.lstrip('-'), name.startswith('-'))
+            for name in self.ordering
+        ]
+
+    def _model_field(self, name):
+        opts = self.queryset.model._meta
+        return opts.pk if name == 'pk' else opts.get_field(name)
+
+    def encode_cursor(self, obj, direction='next'):
+        values = []
+        for name, _ in self.fields:
+            # attname: a foreign key is encoded by its id without loading the related row.
+            value = getattr(obj, self._model_field(name).attname)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            values.append(value)
+        payload = json.dumps([direction, values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            direction, raw_values = json.loads(base64.urlsafe_b64decode(padded))
+            if direction not in ('next', 'prev') or len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [
+                self._model_field(name).to_python(value)
+                for (name, _), value in zip(self.fields, raw_values)
+            ]
+        except (TypeError, ValueError, ValidationError) as exc:
+            raise InvalidCursor('Invalid cursor') from exc
+        return direction, values
+
+    def _seek(self, values, forward):
+        """
+        Build (f1 > v1) OR (f1 = v1 AND f2 > v2) OR ... for the given direction.
+        """
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.fields, values):
+            lookup = 'lt' if descending == forward else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        return condition
+
+    def _reversed_ordering(self):
+        return [name[1:] if name.startswith('-') else f'-{name}' for name in self.ordering]
+
+    def _page_queryset(self, cursor):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        forward = direction == 'next'
+
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._seek(values, forward))
+        queryset = queryset.order_by(*(self.ordering if forward else self._reversed_ordering()))
+        return queryset[:self.per_page + 1], forward, values is not None
+
+    def _make_page(self, rows, forward, has_cursor):
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not forward:
+            rows.reverse()
+
+        has_next = has_more if forward else has_cursor
+        has_previous = has_cursor if forward else has_more
+
+        return KeysetPage(
+            rows,
+            self,
+            next_cursor=self.encode_cursor(rows[-1], 'next') if rows and has_next else None,
+            previous_cursor=self.encode_cursor(rows[0], 'prev') if rows and has_previous else None,
+        )
+
+    def get_page(self, cursor=None):
+        queryset, forward, has_cursor = self._page_queryset(cursor)
+        return self._make_page(list(queryset), forward, has_cursor)
+
+    async def aget_page(self, cursor=None):
+        queryset, forward, has_cursor = self._page_queryset(cursor)
+        return self._make_page([row async for row in queryset], forward, has_cursor)
+
+
+def _table_estimate(queryset):
+    """
+    Row count of the queryset's table from the planner statistics, or None
+    when the database has not been analyzed.
+    """
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'postgresql':
+        sql = 'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass'
+    elif connection.vendor == 'sqlite':
+        # The first number of a sqlite_stat1 row is the row count of its index,
+        # which for a partial index covers only part of the table.
+        sql = 'SELECT MAX(CAST(stat AS INTEGER)) FROM sqlite_stat1 WHERE tbl = %s'
+    else:
+        return None
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(sql, [table])
+            row = cursor.fetchone()
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run.
+        return None
+    # reltuples is -1 for a table PostgreSQL has never analyzed.
+    return row[0] if row and row[0] is not None and row[0] >= 0 else None
+
+
+def approximate_count(queryset, cap=APPROXIMATE_COUNT_CAP):
+    """
+    Return ``(count, exact)`` for ``queryset`` without scanning all of it.
+
+    A whole table is estimated from the planner statistics when it holds
+    more than ``cap`` rows. Filtered querysets are counted up to ``cap``;
+    past that the count is ``cap`` and only a lower bound.
+    """
+    query = queryset.query
+    if not query.where and not query.distinct and not query.is_sliced:
+        estimate = _table_estimate(queryset)
+        if estimate is not None and estimate > cap:
+            return estimate, False
+    count = queryset.order_by()[:cap + 1].count()
+    if count > cap:
+        return cap, False
+    return count, True
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator counting with approximate_count(), for admin changelists.
+
+    Past ``count_cap`` rows of a filtered queryset the last pages are not linked.
+    """
+
+    count_cap = 10000
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list, cap=self.count_cap)[0]
+
+
+class KeysetPagination(BasePagination):
+    """
+    DRF pagination with KeysetPaginator: pages are ``{next, previous, results}``
+    and cost the same however deep they are, with no COUNT query.
+
+    The ordering comes from the view's ordering filter (?ordering=) or
+    ``ordering``; 'pk' is appended to make it unique. Ordered fields must
+    not be nullable. ``?count=approximate`` adds ``count`` and
+    ``count_is_exact`` from approximate_count().
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    ordering = ('-pk',)
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering'):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        ordering = list(ordering or self.ordering)
+        if not {'pk', 'id'} & {name.lstrip('-') for name in ordering}:
+            ordering.append('-pk' if ordering[0].startswith('-') else 'pk')
+        return ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        paginator = KeysetPaginator(queryset, self.get_ordering(request, queryset, view), self.page_size)
+        try:
+            self.page = paginator.get_page(request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            raise NotFound(self.invalid_cursor_message)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'approximate':
+            self.count = approximate_count(queryset)
+        return list(self.page)
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.page.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.page.previous_cursor)
+
+    def get_paginated_response(self, data):
+        response = {}
+        if self.count is not None:
+            response['count'], response['count_is_exact'] = self.count
+        response['next'] = self.get_next_link()
+        response['previous'] = self.get_previous_link()
+        response['results'] = data
+        return Response(response)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'count_is_exact': {'type': 'boolean'},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to "approximate" to include an estimated count.',
+                'schema': {'type': 'string', 'enum': ['approximate']},
+            },
+        ]
+
+
+class CountFreePageNumberPagination(PageNumberPagination):
+    """
+    ?page= pagination that reads one row past the page to know whether there
+    is a next one instead of counting every row. For orderings keyset pages
+    can't seek on, such as search relevance.
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        page_size = self.get_page_size(request)
+        try:
+            self.number = int(request.query_params.get(self.page_query_param, 1))
+            if self.number < 1:
+                raise ValueError
+        except ValueError:
+            raise NotFound(self.invalid_page_message)
+        offset = (self.number - 1) * page_size
+        rows = list(queryset[offset:offset + page_size + 1])
+        self.has_next = len(rows) > page_size
+        return rows[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.number + 1)
+
+    def get_previous_link(self):
+        if self.number == 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        del response_schema['properties']['count']
+        response_schema['required'].remove('count')
+        return response_schema
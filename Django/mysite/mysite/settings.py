@@ -14,6 +14,7 @@ from os import getenv
 from pathlib import Path
 
 from django.conf.global_settings import LOCALE_PATHS
+from django.core.exceptions import ImproperlyConfigured
 from django.urls import reverse_lazy
 from django.utils.translation import gettext_lazy as _
 
@@ -60,6 +61,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mysite.middleware.RequestMetricsMiddleware',
+    'mysite.routers.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -84,6 +87,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'libraries': {
+                'fragment_cache': 'mysite.templatetags.fragment_cache',
+            },
         },
     },
 ]
@@ -93,13 +99,116 @@ WSGI_APPLICATION = 'mysite.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-DATABASES = {
+# Applied on every new SQLite connection. WAL lets readers run alongside the single
+# writer and busy_timeout makes gunicorn workers wait for the write lock
+# instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': getenv('DJANGO_SQLITE_JOURNAL_MODE') or 'WAL',
+    'synchronous': getenv('DJANGO_SQLITE_SYNCHRONOUS') or 'NORMAL',
+    'busy_timeout': int(getenv('DJANGO_SQLITE_BUSY_TIMEOUT') or 5000),
+    'mmap_size': int(getenv('DJANGO_SQLITE_MMAP_SIZE') or 128 * 1024 * 1024),
+    # Negative values are KiB rather than pages.
+    'cache_size': int(getenv('DJANGO_SQLITE_CACHE_SIZE') or -32000),
+}
+
+if getenv('DJANGO_DB_ENGINE') == 'postgresql':
+    # Connection pooling is opt-in: it needs psycopg[pool], which is not
+    # a project dependency. Install it and set DJANGO_DB_POOL=1, otherwise
+    # persistent connections (CONN_MAX_AGE) are used.
+    if getenv('DJANGO_DB_POOL') == '1':
+        try:
+            import psycopg_pool  # noqa: F401
+        except ImportError:
+            raise ImproperlyConfigured('DJANGO_DB_POOL=1 requires psycopg[pool] to be installed.')
+        POSTGRES_POOL = {
+            'min_size': int(getenv('DJANGO_DB_POOL_MIN_SIZE') or 2),
+            'max_size': int(getenv('DJANGO_DB_POOL_MAX_SIZE') or 10),
+            'timeout': int(getenv('DJANGO_DB_POOL_TIMEOUT') or 10),
+        }
+    else:
+        POSTGRES_POOL = None
+
+    def postgres_database(host):
+        database = {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': getenv('DJANGO_DB_NAME') or 'mysite',
+            'USER': getenv('DJANGO_DB_USER') or 'mysite',
+            'PASSWORD': getenv('DJANGO_DB_PASSWORD') or '',
+            'HOST': host,
+            'PORT': getenv('DJANGO_DB_PORT') or '5432',
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {},
+        }
+        if POSTGRES_POOL:
+            # Pooled connections can't also be persistent ones.
+            database['OPTIONS']['pool'] = POSTGRES_POOL
+        else:
+            database['CONN_MAX_AGE'] = int(getenv('DJANGO_CONN_MAX_AGE') or 600)
+        return database
+
+    DATABASES = {'default': postgres_database(getenv('DJANGO_DB_HOST') or 'localhost')}
+    if getenv('DJANGO_DB_REPLICA_HOST'):
+        DATABASES['replica'] = postgres_database(getenv('DJANGO_DB_REPLICA_HOST'))
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': DATABASEE_DIR / 'db.sqlite3',
+            'CONN_MAX_AGE': int(getenv('DJANGO_CONN_MAX_AGE') or 600),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {
+                'init_command': ';'.join(f'PRAGMA {name}={value}' for name, value in SQLITE_PRAGMAS.items()),
+                # Take the write lock at BEGIN, where busy_timeout applies, rather than
+                # failing when a read transaction tries to upgrade.
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': SQLITE_PRAGMAS['busy_timeout'] / 1000,
+            },
+        }
+    }
+    if getenv('DJANGO_SQLITE_REPLICA_NAME'):
+        # A read-only copy of the file, e.g. restored by litestream.
+        DATABASES['replica'] = {**DATABASES['default'], 'NAME': getenv('DJANGO_SQLITE_REPLICA_NAME')}
+
+REPLICA_DATABASE = 'replica' if 'replica' in DATABASES else None
+if REPLICA_DATABASE:
+    DATABASES[REPLICA_DATABASE]['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['mysite.routers.PrimaryReplicaRouter']
+
+# Views whose GET requests read from REPLICA_DATABASE. After a POST the
+# client reads from the primary for REPLICA_STICKY_SECONDS, so it sees
+# its own writes despite replication lag.
+REPLICA_VIEWS = {
+    'shopapp:products',
+    'shopapp:products_details',
+    'shopapp:product-list',
+    'shopapp:order-list',
+    'shopapp:feed',
+    'sitemaps',
+    'sitemap_section',
+}
+REPLICA_STICKY_SECONDS = 10
+
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': DATABASEE_DIR / 'db.sqlite3',
+        'BACKEND': 'mysite.cache_backends.TieredCache',
+        'LOCATION': getenv('DJANGO_CACHE_DIR', DATABASEE_DIR / 'cache'),
+        'OPTIONS': {
+            # Row fragments take a few entries per listed object.
+            'MAX_ENTRIES': int(getenv('DJANGO_CACHE_MAX_ENTRIES') or 100_000),
+            'L1_MAX_BYTES': int(getenv('DJANGO_CACHE_L1_MAX_BYTES') or 32 * 1024 * 1024),
+            'L1_TIMEOUT': float(getenv('DJANGO_CACHE_L1_TIMEOUT') or 5),
+            'JITTER': 0.1,
+        },
     }
 }
 
+# Gives the cache a temporary LOCATION while tests run.
+TEST_RUNNER = 'mysite.testing.TestRunner'
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -121,7 +230,7 @@ AUTH_PASSWORD_VALIDATORS = [
 # Internationalization
 # https://docs.djangoproject.com/en/4.0/topics/i18n/
 
-LANGUAGE_CODE = 'en-us'
+LANGUAGE_CODE = 'en'
 
 TIME_ZONE = 'UTC'
 
@@ -149,6 +258,9 @@ MEDIA_URL = '/media/'
 
 MEDIA_ROOT = BASE_DIR / 'uploads'
 
+# Pre-rendered sitemap files, see the render_sitemaps management command.
+SITEMAP_ROOT = Path(getenv('DJANGO_SITEMAP_ROOT', DATABASEE_DIR / 'sitemaps'))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
@@ -174,14 +286,33 @@ SPECTACULAR_SETTINGS = {
     'SERVE_INCLUDE_SCHEMA': False,
 }
 
+# Per-view limits checked by mysite.middleware.RequestMetricsMiddleware and
+# mysite.testing.QueryBudgetMixin. Keys are namespaced URL names, limits are
+# any of queries, db_ms, total_ms and size. Query counts include the session,
+# user and permission lookups of a logged in user.
+REQUEST_BUDGETS = {
+    'shopapp:products': {'queries': 5, 'total_ms': 300},
+    'shopapp:products_details': {'queries': 7, 'total_ms': 300},
+    'shopapp:orders': {'queries': 7, 'total_ms': 500},
+    'shopapp:users_orders_export': {'queries': 5, 'total_ms': 500},
+    'shopapp:product-list': {'queries': 5, 'total_ms': 500},
+    'shopapp:order-list': {'queries': 5, 'total_ms': 500},
+    'shopapp:feed': {'queries': 2, 'total_ms': 300},
+    'myauth:list_users': {'queries': 5, 'total_ms': 300},
+    'blogapp:articles_list': {'queries': 5, 'total_ms': 500},
+}
+
+REQUEST_METRICS_SERVER_TIMING = getenv('DJANGO_SERVER_TIMING', '1') == '1'
+
 LOGLEVEL = getenv('DJANGO_LOGLEVEL', 'info').upper()
+METRICS_LOGLEVEL = getenv('DJANGO_METRICS_LOGLEVEL', LOGLEVEL).upper()
 
 logging.config.dictConfig({
     'version': 1,
     'disable_existing_loggers': False,
     'formatters': {
         'console': {
-            'format': '%(asctime)s %(lelvelname)s [%(name)s:%(lineno)s] %(module)s %(message)s',
+            'format': '%(asctime)s %(levelname)s [%(name)s:%(lineno)s] %(module)s %(message)s',
         },
     },
     'handlers': {
@@ -197,5 +328,8 @@ logging.config.dictConfig({
                 'console',
             ]
         },
+        'mysite.middleware': {
+            'level': METRICS_LOGLEVEL,
+        },
     },
 })
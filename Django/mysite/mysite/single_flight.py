@@ -0,0 +1,148 @@
+"""
+Single-flight recompute for cached values.
+
+Entries are stored with the time they stop being fresh and stay in the
+cache for a grace period after it. Once an entry is stale, or is about to
+be (randomly earlier the longer it took to compute), one worker takes a
+lock and recomputes it while the others keep serving the stale value.
+When there is nothing to serve at all, the others wait for that worker
+instead of hitting the database themselves.
+"""
+import asyncio
+import math
+import random
+import time
+from functools import wraps
+
+from django.core.cache import cache as default_cache
+
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+
+def _lock_key(key):
+    return f'{key}:lock'
+
+
+def _is_fresh(entry, beta):
+    fresh_until, elapsed, _ = entry
+    # XFetch: the chance of refreshing early grows as expiry gets closer.
+    early = elapsed * beta * -math.log(1.0 - random.random())
+    return time.time() + early < fresh_until
+
+
+def _store(cache, key, compute, timeout, grace):
+    started = time.monotonic()
+    value = compute()
+    elapsed = time.monotonic() - started
+    cache.set(key, (time.time() + timeout, elapsed, value), timeout + grace)
+    return value
+
+
+def _recompute(cache, key, compute, timeout, grace, lock_timeout):
+    """
+    Recompute under the lock, or return None if another worker holds it.
+    """
+    if not cache.add(_lock_key(key), True, lock_timeout):
+        return None
+    try:
+        return (_store(cache, key, compute, timeout, grace),)
+    finally:
+        cache.delete(_lock_key(key))
+
+
+def get_or_recompute(key, compute, timeout, grace=None, beta=1.0, cache=None,
+                     lock_timeout=LOCK_TIMEOUT, wait_timeout=WAIT_TIMEOUT):
+    """
+    Return the cached value of ``key``, calling ``compute()`` in at most one
+    worker at a time to refresh it.
+
+    ``timeout`` is how long a value is fresh and ``grace`` (default the same)
+    how long it may be served stale afterwards. ``beta`` scales the early
+    recompute, 0 turns it off.
+    """
+    cache = cache or default_cache
+    grace = timeout if grace is None else grace
+
+    entry = cache.get(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            return entry[2]
+        recomputed = _recompute(cache, key, compute, timeout, grace, lock_timeout)
+        return entry[2] if recomputed is None else recomputed[0]
+
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        recomputed = _recompute(cache, key, compute, timeout, grace, lock_timeout)
+        if recomputed is not None:
+            return recomputed[0]
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[2]
+        if time.monotonic() >= deadline:
+            # The worker holding the lock is too slow or gone.
+            return _store(cache, key, compute, timeout, grace)
+
+
+async def _astore(cache, key, compute, timeout, grace):
+    started = time.monotonic()
+    value = await compute()
+    elapsed = time.monotonic() - started
+    await cache.aset(key, (time.time() + timeout, elapsed, value), timeout + grace)
+    return value
+
+
+async def _arecompute(cache, key, compute, timeout, grace, lock_timeout):
+    if not await cache.aadd(_lock_key(key), True, lock_timeout):
+        return None
+    try:
+        return (await _astore(cache, key, compute, timeout, grace),)
+    finally:
+        await cache.adelete(_lock_key(key))
+
+
+async def aget_or_recompute(key, compute, timeout, grace=None, beta=1.0, cache=None,
+                            lock_timeout=LOCK_TIMEOUT, wait_timeout=WAIT_TIMEOUT):
+    """
+    get_or_recompute() for async views, ``compute`` is a coroutine function.
+    """
+    cache = cache or default_cache
+    grace = timeout if grace is None else grace
+
+    entry = await cache.aget(key)
+    if entry is not None:
+        if _is_fresh(entry, beta):
+            return entry[2]
+        recomputed = await _arecompute(cache, key, compute, timeout, grace, lock_timeout)
+        return entry[2] if recomputed is None else recomputed[0]
+
+    deadline = time.monotonic() + wait_timeout
+    while True:
+        recomputed = await _arecompute(cache, key, compute, timeout, grace, lock_timeout)
+        if recomputed is not None:
+            return recomputed[0]
+        await asyncio.sleep(WAIT_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry[2]
+        if time.monotonic() >= deadline:
+            return await _astore(cache, key, compute, timeout, grace)
+
+
+def single_flight(key_func, timeout, **options):
+    """
+    Decorator form of get_or_recompute(), keyed by ``key_func(*args, **kwargs)``.
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            return get_or_recompute(
+                key_func(*args, **kwargs),
+                lambda: func(*args, **kwargs),
+                timeout,
+                **options,
+            )
+        return wrapper
+    return decorator
@@ -1,5 +1,81 @@
+from django.conf import settings
+from django.contrib.sitemaps import views as sitemap_views
+from django.core.cache import cache
+from django.http import Http404, HttpResponse
+from django.utils.translation import get_language
+from django.views.decorators.http import condition
+
+from shopapp.caching import products_last_modified
 from shopapp.sitemap import ShopSitemap
 
 sitemaps = {
     'shop': ShopSitemap,
-}
\ No newline at end of file
+}
+
+SITEMAP_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+def sitemap_filename(section=None, page=1):
+    return 'sitemap.xml' if section is None else f'sitemap-{section}-{page}.xml'
+
+
+def render_sitemap(request, section=None):
+    """
+    Render the sitemap index (section=None) or the section page given by ?p=.
+    """
+    if section is None:
+        response = sitemap_views.index(request, sitemaps, sitemap_url_name='sitemap_section')
+    else:
+        response = sitemap_views.sitemap(request, sitemaps, section=section)
+    return response.render().content
+
+
+def _xml_response(content):
+    response = HttpResponse(content, content_type='application/xml')
+    response.headers['X-Robots-Tag'] = 'noindex, noodp, noarchive'
+    return response
+
+
+def _serve(request, section=None):
+    if section is not None and section not in sitemaps:
+        raise Http404(f'No sitemap available for section: {section!r}')
+    try:
+        page = int(request.GET.get('p', 1))
+    except ValueError:
+        raise Http404('Invalid sitemap page')
+
+    version = products_last_modified().timestamp()
+    language = get_language()
+
+    # Files written by the render_sitemaps command, in the default language,
+    # are served while they are newer than the latest product change.
+    if language == settings.LANGUAGE_CODE:
+        path = settings.SITEMAP_ROOT / sitemap_filename(section, page)
+        try:
+            if path.stat().st_mtime >= version:
+                return _xml_response(path.read_bytes())
+        except FileNotFoundError:
+            pass
+
+    # Product URLs carry the language prefix.
+    cache_key = f'sitemap:{request.get_host()}:{language}:{section}:{page}:{version}'
+    content = cache.get(cache_key)
+    if content is None:
+        content = render_sitemap(request, section)
+        cache.set(cache_key, content, SITEMAP_CACHE_TIMEOUT)
+    return _xml_response(content)
+
+
+def sitemap_etag(request, *args, **kwargs):
+    # Last-Modified alone would answer 304 to a client switching languages.
+    return f'"{products_last_modified().timestamp()}-{get_language()}"'
+
+
+@condition(etag_func=sitemap_etag, last_modified_func=products_last_modified)
+def sitemap_index(request):
+    return _serve(request)
+
+
+@condition(etag_func=sitemap_etag, last_modified_func=products_last_modified)
+def sitemap_section(request, section):
+    return _serve(request, section)
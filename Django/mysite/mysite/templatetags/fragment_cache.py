@@ -0,0 +1,41 @@
+from django import template
+
+from mysite.fragment_cache import get_or_render
+
+register = template.Library()
+
+
+class RowCacheNode(template.Node):
+
+    def __init__(self, nodelist, obj, vary_on):
+        self.nodelist = nodelist
+        self.obj = obj
+        self.vary_on = vary_on
+
+    def render(self, context):
+        obj = self.obj.resolve(context)
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        # Model versions are read once per template render, not per row.
+        memo = context.render_context.setdefault(self, {})
+        return get_or_render(obj, lambda: self.nodelist.render(context), vary_on, memo)
+
+
+@register.tag
+def rowcache(parser, token):
+    """
+    Cache the enclosed fragment per model row::
+
+        {% rowcache product [vary_on ...] %}...{% endrowcache %}
+
+    The model must be registered with mysite.fragment_cache.register().
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(f"'{bits[0]}' tag requires an object to cache")
+    nodelist = parser.parse(('endrowcache',))
+    parser.delete_first_token()
+    return RowCacheNode(
+        nodelist,
+        parser.compile_filter(bits[1]),
+        [parser.compile_filter(bit) for bit in bits[2:]],
+    )
@@ -0,0 +1,70 @@
+import copy
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+TEST_REPLICA_DATABASE = 'replica'
+
+
+class TestRunner(DiscoverRunner):
+    """
+    Test runner giving the file cache tier a temporary directory, so tests
+    calling cache.clear() don't wipe the real one.
+
+    On SQLite without a configured replica it also adds a separate
+    TEST_REPLICA_DATABASE, so router tests read through a second
+    connection. REPLICA_DATABASE stays unset, tests opt in with
+    override_settings().
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.add_test_replica()
+        self.cache_dir = tempfile.mkdtemp(prefix='mysite-test-cache-')
+        self.cache_override = override_settings(CACHES={
+            alias: {**config, 'LOCATION': os.path.join(self.cache_dir, alias)}
+            for alias, config in settings.CACHES.items()
+        })
+        self.cache_override.enable()
+
+    def add_test_replica(self):
+        default = settings.DATABASES['default']
+        if TEST_REPLICA_DATABASE in settings.DATABASES or 'sqlite3' not in default['ENGINE']:
+            return
+        replica = copy.deepcopy(default)
+        replica.pop('TEST', None)
+        settings.DATABASES[TEST_REPLICA_DATABASE] = replica
+        # The connection handler may have read DATABASES already.
+        connections.settings[TEST_REPLICA_DATABASE] = connections.configure_settings(
+            {'default': copy.deepcopy(default), TEST_REPLICA_DATABASE: copy.deepcopy(replica)}
+        )[TEST_REPLICA_DATABASE]
+
+    def teardown_test_environment(self, **kwargs):
+        self.cache_override.disable()
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
+
+
+class QueryBudgetMixin:
+    """
+    TestCase mixin checking responses against settings.REQUEST_BUDGETS.
+
+    Needs RequestMetricsMiddleware, which puts request_metrics on every response.
+    """
+
+    def assertWithinQueryBudget(self, response):
+        metrics = response.request_metrics
+        budget = settings.REQUEST_BUDGETS.get(metrics['view'])
+        if budget is None or 'queries' not in budget:
+            self.fail(f'No query budget for {metrics["view"]!r} in REQUEST_BUDGETS')
+        self.assertLessEqual(
+            metrics['queries'],
+            budget['queries'],
+            f'{metrics["view"]} ran {metrics["queries"]} queries, budget is {budget["queries"]}',
+        )
@@ -18,10 +18,9 @@ from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from django.conf.urls.i18n import i18n_patterns
-from django.contrib.sitemaps.views import sitemap
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularRedocView, SpectacularSwaggerView
-from .sitemaps import sitemaps
+from .sitemaps import sitemap_index, sitemap_section
 
 urlpatterns = [
     path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
@@ -33,14 +32,14 @@ urlpatterns = [
 
     path('blog/', include('blogapp.urls')),
 
-    path(
-        'sitemap.xml', sitemap, {'sitemaps': sitemaps}, name='sitemaps'
-    )
+    path('sitemap.xml', sitemap_index, name='sitemaps'),
+    path('sitemap-<slug:section>.xml', sitemap_section, name='sitemap_section'),
 ]
 
-urlpatterns += i18n_patterns(
+shop_urlpatterns = i18n_patterns(
     path('shop/', include('shopapp.urls')),
 )
+urlpatterns += shop_urlpatterns
 
 
 if settings.DEBUG:
@@ -0,0 +1,12 @@
+"""
+URL configuration of mysite.asgi: mysite.urls with the async shop views.
+"""
+from django.conf.urls.i18n import i18n_patterns
+from django.urls import include, path
+
+from . import urls
+
+urlpatterns = [pattern for pattern in urls.urlpatterns if pattern not in urls.shop_urlpatterns]
+urlpatterns += i18n_patterns(
+    path('shop/', include('shopapp.urls_asgi')),
+)
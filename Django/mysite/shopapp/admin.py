@@ -1,66 +1,139 @@
 from io import TextIOWrapper
 from csv import DictReader
 
-from django.contrib import admin
-from django.db import transaction
+from django.contrib import admin, messages
+from django.db import connection
 from django.db.models import QuerySet
+from django.db.models.functions import Substr
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import render, redirect
-from django.urls import path
-from django.contrib.auth.models import User
+from django.template.defaultfilters import truncatechars
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
+from django.utils.http import urlencode
+
+from mysite.pagination import EstimatedCountPaginator
 
 from .models import Product, Order
+from .aggregates import recompute_order_aggregates, recompute_product_aggregates
+from .caching import bump_products_version, invalidate_products_last_modified, invalidate_user_orders
 from .forms import CSVImportForm
+from .importers import import_orders
+from .search import get_search_backend
+
+DESCRIPTION_PREVIEW_LENGTH = 50
+
+
+class ScalableAdminMixin:
+    """
+    Changelist settings for tables too big to count or search by scanning.
+
+    A numeric search term matches the pk exactly, on the primary key index,
+    so search_fields only need the text columns.
+    """
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
+    def get_search_results(self, request, queryset, search_term):
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        try:
+            pk = int(search_term)
+        except ValueError:
+            return results, may_have_duplicates
+        low, high = connection.ops.integer_field_range(self.opts.pk.get_internal_type())
+        if low <= pk <= high:
+            results |= queryset.filter(pk=pk)
+        return results, may_have_duplicates
 
-class OrderInLine(admin.TabularInline):
-    model = Product.orders.through
 
 @admin.action(description='Archive product')
 def mark_archived(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
-    queryset.update(archivaed=True)
+    queryset.update(archived=True, modified_at=timezone.now())
+    invalidate_products_last_modified()
+    bump_products_version()
+    get_search_backend().remove(queryset.values_list('pk', flat=True))
 
 @admin.action(description='Unarchive product')
 def mark_unarchived(modeladmin: admin.ModelAdmin, request: HttpRequest, queryset: QuerySet):
-    queryset.update(archivaed=False)
+    queryset.update(archived=False, modified_at=timezone.now())
+    invalidate_products_last_modified()
+    bump_products_version()
+    get_search_backend().index(queryset.only('pk', 'name', 'description', 'archived'))
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
-    list_display = 'pk', 'name', 'description', 'price', 'discount', 'archived'
+class ProductAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = 'pk', 'name', 'description_preview', 'price', 'discount', 'orders_count', 'archived'
     list_display_links = 'pk', 'name'
-    search_fields = 'name', 'price', 'pk'
-    inlines = [
-        OrderInLine,
-    ]
+    search_fields = 'name',
+    # Order lines are edited on the order and listed through orders_link,
+    # an inline would render every line of a popular product.
+    readonly_fields = 'orders_link',
     fieldsets  = [
         (None, {'fields':
                     ('name', 'description')}),
         ('Price information', {'fields':
                     ('price', 'discount')}),
+        ('Orders', {'fields': ('orders_link',)}),
         ('Archived', {'fields':('archived',),
                     'classes': ('collapse',)})
     ]
 
     actions = [mark_archived, mark_unarchived]
 
+    def get_queryset(self, request):
+        # The changelist reads only the start of descriptions, the change form loads the rest.
+        return super().get_queryset(request).defer('description').annotate(
+            description_start=Substr('description', 1, DESCRIPTION_PREVIEW_LENGTH + 1),
+        )
+
+    @admin.display(description='Description')
+    def description_preview(self, product: Product):
+        return truncatechars(product.description_start or '', DESCRIPTION_PREVIEW_LENGTH)
+
+    @admin.display(description='Orders')
+    def orders_link(self, product: Product):
+        if product.pk is None:
+            return '-'
+        url = reverse('admin:shopapp_order_changelist')
+        query = urlencode({'products__id__exact': product.pk})
+        return format_html('<a href="{}?{}">{} orders</a>', url, query, product.orders_count)
+
 
-class ProductInLine(admin.StackedInline):
+class ProductInLine(admin.TabularInline):
     model = Order.products.through
+    autocomplete_fields = 'product',
+    extra = 0
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = 'pk', 'delivery_address', 'created_at', 'user'
+class OrderAdmin(ScalableAdminMixin, admin.ModelAdmin):
+    list_display = 'pk', 'delivery_address', 'created_at', 'user', 'item_count', 'total_amount'
     list_display_links = 'pk', 'delivery_address'
-    search_fields = 'delivery_address', 'pk'
+    search_fields = 'delivery_address',
+    # The products are edited in ProductInLine.
+    exclude = 'products',
+    raw_id_fields = 'user',
     inlines = [
         ProductInLine,
     ]
     change_list_template = 'shopapp/orders_changelist.html'
 
     def get_queryset(self, request):
-
-        return Order.objects.select_related('user').prefetch_related('products')
-
+        return super().get_queryset(request).select_related('user')
+
+    def save_related(self, request, form, formsets, change):
+        # Inline rows are saved without the m2m_changed signal that keeps the aggregates up to date.
+        lines = Order.products.through.objects.filter(order=form.instance).values_list('product_id', flat=True)
+        before = set(lines)
+        super().save_related(request, form, formsets, change)
+        changed = before ^ set(lines.all())
+        if changed:
+            recompute_order_aggregates([form.instance.pk])
+            recompute_product_aggregates(changed)
+            # The order's post_save ran before its lines changed.
+            invalidate_user_orders([form.instance.user_id])
 
     def import_csv(self, request: HttpRequest) -> HttpResponse:
         if request.method == "GET":
@@ -83,30 +156,21 @@ class OrderAdmin(admin.ModelAdmin):
         )
         reader = DictReader(csv_file)
 
+        result = import_orders(reader, default_user=request.user)
 
-        with transaction.atomic():
-            for order in reader:
-
-                user_id = order.get('user')
-                if user_id:
-                    try:
-                        user = User.objects.get(id=int(user_id))
-                    except (User.DoesNotExist, ValueError):
-                        user = request.user
-                else:
-                    user = request.user
-
-                new_order = Order.objects.create(
-                    delivery_address=order.get('delivery_address'),
-                    promo=order.get('promo'),
-                    user=user,
-                )
-
-                products_str = order.get('products')
-                products_ids = [int(id) for id in products_str.split(',')]
-                new_order.products.set(products_ids)
-
-        self.message_user(request, "DATA from CSV wa imported")
+        self.message_user(
+            request,
+            f"Imported {result.created} of {result.rows} orders from CSV "
+            f"({result.rows_per_second:.0f} rows/s)"
+        )
+        for line, error in result.errors[:20]:
+            self.message_user(request, f"Line {line}: {error}", level=messages.WARNING)
+        if len(result.errors) > 20:
+            self.message_user(
+                request,
+                f"{len(result.errors) - 20} more rows were skipped",
+                level=messages.WARNING,
+            )
         return redirect('..')
 
     def get_urls(self):
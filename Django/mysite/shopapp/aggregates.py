@@ -0,0 +1,50 @@
+from decimal import Decimal
+
+from django.db.models import (Count, DecimalField, ExpressionWrapper, F, OuterRef,
+                              Subquery, Sum, Value)
+from django.db.models.functions import Coalesce, Round
+
+from .models import Order, Product
+
+TOTAL_FIELD = DecimalField(max_digits=12, decimal_places=2)
+
+# A Decimal factor instead of "/ 100", which is integer division on SQLite.
+LINE_PRICE = ExpressionWrapper(
+    F('product__price') * (100 - F('product__discount')) * Value(Decimal('0.01')),
+    output_field=TOTAL_FIELD,
+)
+
+
+def order_aggregates():
+    """
+    Expressions for Order.total_amount and Order.item_count, for QuerySet.update().
+    """
+    lines = Order.products.through.objects.filter(order_id=OuterRef('pk')).values('order_id')
+    return {
+        'total_amount': Coalesce(
+            Subquery(lines.annotate(total=Round(Sum(LINE_PRICE), 2, output_field=TOTAL_FIELD)).values('total')),
+            Value(Decimal('0.00')),
+            output_field=TOTAL_FIELD,
+        ),
+        'item_count': Coalesce(Subquery(lines.annotate(count=Count('pk')).values('count')), 0),
+    }
+
+
+def product_aggregates():
+    lines = Order.products.through.objects.filter(product_id=OuterRef('pk')).values('product_id')
+    return {
+        'orders_count': Coalesce(Subquery(lines.annotate(count=Count('pk')).values('count')), 0),
+    }
+
+
+def recompute_order_aggregates(order_ids=None):
+    """
+    Recompute the stored totals of the given orders (all orders for None) in one UPDATE.
+    """
+    orders = Order.objects.all() if order_ids is None else Order.objects.filter(pk__in=order_ids)
+    return orders.update(**order_aggregates())
+
+
+def recompute_product_aggregates(product_ids=None):
+    products = Product.objects.all() if product_ids is None else Product.objects.filter(pk__in=product_ids)
+    return products.update(**product_aggregates())
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ShopappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'shopapp'
+
+    def ready(self):
+        from django.contrib.auth.models import User
+
+        from mysite import fragment_cache
+        from . import signals
+        from .models import Order, Product
+
+        fragment_cache.register(Product)
+        fragment_cache.register(
+            Order,
+            depends_on={Product: ('name',), User: ('username', 'first_name')},
+            m2m=(Order.products.through,),
+        )
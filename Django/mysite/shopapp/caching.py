@@ -0,0 +1,98 @@
+from django.core.cache import cache
+from django.db.models import Max
+from django.utils import timezone
+
+from .models import Product
+
+USER_ORDERS_CACHE_TIMEOUT = 180
+
+
+def user_orders_cache_key(user_id):
+    return f'orders_data:{user_id}'
+
+
+def invalidate_user_orders(user_ids):
+    cache.delete_many([user_orders_cache_key(user_id) for user_id in set(user_ids)])
+
+
+PRODUCTS_LAST_MODIFIED_KEY = 'products_last_modified'
+PRODUCTS_LAST_MODIFIED_TIMEOUT = 300
+PRODUCTS_VERSION_KEY = 'products_version'
+
+
+def products_version():
+    """
+    Time of the last product delete or archive.
+
+    MAX(modified_at) misses both: a deleted row takes its modified_at with
+    it, and QuerySet.update() archives need not touch it. An evicted
+    version restarts at the current time, so it never makes older
+    responses look current.
+    """
+    version = cache.get(PRODUCTS_VERSION_KEY)
+    if version is None:
+        cache.add(PRODUCTS_VERSION_KEY, timezone.now(), None)
+        version = cache.get(PRODUCTS_VERSION_KEY)
+    return version
+
+
+async def aproducts_version():
+    version = await cache.aget(PRODUCTS_VERSION_KEY)
+    if version is None:
+        await cache.aadd(PRODUCTS_VERSION_KEY, timezone.now(), None)
+        version = await cache.aget(PRODUCTS_VERSION_KEY)
+    return version
+
+
+def bump_products_version():
+    cache.set(PRODUCTS_VERSION_KEY, timezone.now(), None)
+
+
+def products_last_modified(request=None, *args, **kwargs):
+    """
+    Latest change to the products, shared by the sitemap and the feed.
+
+    modified_at starts at creation_date and is bumped on every save, so one
+    MAX() over its index covers both new and edited products;
+    products_version() covers deleted and archived ones.
+    """
+    last_modified = cache.get(PRODUCTS_LAST_MODIFIED_KEY)
+    if last_modified is None:
+        last_modified = Product.objects.aggregate(last_modified=Max('modified_at'))['last_modified']
+        cache.set(PRODUCTS_LAST_MODIFIED_KEY, last_modified, PRODUCTS_LAST_MODIFIED_TIMEOUT)
+    return max(filter(None, (last_modified, products_version())))
+
+
+def invalidate_products_last_modified():
+    cache.delete(PRODUCTS_LAST_MODIFIED_KEY)
+
+
+async def aproducts_last_modified():
+    last_modified = await cache.aget(PRODUCTS_LAST_MODIFIED_KEY)
+    if last_modified is None:
+        last_modified = (await Product.objects.aaggregate(last_modified=Max('modified_at')))['last_modified']
+        await cache.aset(PRODUCTS_LAST_MODIFIED_KEY, last_modified, PRODUCTS_LAST_MODIFIED_TIMEOUT)
+    return max(filter(None, (last_modified, await aproducts_version())))
+
+
+def product_last_modified(request, pk):
+    if not hasattr(request, '_product_modified_at'):
+        request._product_modified_at = (
+            Product.objects
+            .filter(pk=pk)
+            .values_list('modified_at', flat=True)
+            .first()
+        )
+    return request._product_modified_at
+
+
+def product_etag(request, pk):
+    modified_at = product_last_modified(request, pk)
+    if modified_at is None:
+        return None
+    return format_product_etag(pk, modified_at, request.user, getattr(request, 'LANGUAGE_CODE', ''))
+
+
+def format_product_etag(pk, modified_at, user, language_code):
+    # The detail page shows per-user links and is translated.
+    return f'"{pk}-{modified_at.timestamp()}-{user.pk or 0}-{language_code}"'
@@ -0,0 +1,92 @@
+import csv
+import json
+from collections import defaultdict
+from io import StringIO
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Order
+
+EXPORT_CHUNK_SIZE = 1000
+CSV_FIELDS = 'pk', 'user', 'delivery_address', 'promo', 'products'
+
+
+def iter_orders(chunk_size=EXPORT_CHUNK_SIZE):
+    """
+    Yield order dicts in pk order, two queries per chunk of orders.
+    """
+    through = Order.products.through
+    last_pk = 0
+    while True:
+        chunk = list(
+            Order.objects
+            .filter(pk__gt=last_pk)
+            .order_by('pk')
+            .values_list('pk', 'delivery_address', 'promo', 'user_id')[:chunk_size]
+        )
+        if not chunk:
+            return
+
+        products = defaultdict(list)
+        lines = (
+            through.objects
+            .filter(order_id__in=[row[0] for row in chunk])
+            .order_by('order_id', 'product_id')
+            .values_list('order_id', 'product_id')
+        )
+        for order_id, product_id in lines:
+            products[order_id].append(product_id)
+
+        for pk, delivery_address, promo, user_id in chunk:
+            yield {
+                'pk': pk,
+                'delivery_address': delivery_address,
+                'promo': promo,
+                'user': user_id,
+                'products': products[pk],
+            }
+        last_pk = chunk[-1][0]
+
+
+def stream_json(orders):
+    yield '{"orders": ['
+    separator = ''
+    for order in orders:
+        yield separator + json.dumps(order, cls=DjangoJSONEncoder)
+        separator = ', '
+    yield ']}'
+
+
+def stream_ndjson(orders):
+    for order in orders:
+        yield json.dumps(order, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream_csv(orders):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+
+    def flush():
+        value = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return value
+
+    writer.writerow(CSV_FIELDS)
+    yield flush()
+    for order in orders:
+        writer.writerow([
+            order['pk'],
+            order['user'],
+            order['delivery_address'],
+            order['promo'],
+            ','.join(str(pk) for pk in order['products']),
+        ])
+        yield flush()
+
+
+EXPORT_FORMATS = {
+    'json': (stream_json, 'application/json'),
+    'ndjson': (stream_ndjson, 'application/x-ndjson'),
+    'csv': (stream_csv, 'text/csv'),
+}
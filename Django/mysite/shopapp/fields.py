@@ -0,0 +1,18 @@
+from django.db import models
+from django.db.models import Lookup
+
+
+class FullTextDocumentField(models.TextField):
+    """
+    The hidden column an SQLite FTS5 table has under its own name, used with __match.
+    """
+
+
+@FullTextDocumentField.register_lookup
+class Match(Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', [*lhs_params, *rhs_params]
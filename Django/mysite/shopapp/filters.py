@@ -0,0 +1,31 @@
+from django_filters import rest_framework as filters
+from rest_framework.filters import SearchFilter
+
+from .models import Order
+from .search import get_search_backend
+
+
+class ProductSearchFilter(SearchFilter):
+    """
+    ?search= backed by the product full-text index, results ranked by relevance.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '').strip()
+        if not query:
+            return queryset
+        return get_search_backend().search(queryset, query)
+
+
+class OrderFilter(filters.FilterSet):
+    """
+    user and products filter by pk without loading every user and product
+    into ModelChoiceFilter querysets.
+    """
+
+    user = filters.NumberFilter(field_name='user_id')
+    products = filters.NumberFilter(field_name='products')
+
+    class Meta:
+        model = Order
+        fields = 'delivery_address', 'user', 'products'
@@ -0,0 +1,33 @@
+from mysite.hot_queries import hot_query
+
+from .models import Order, Product
+
+
+@hot_query('shopapp:products')
+def products_list():
+    return Product.objects.filter(archived=False).order_by('creation_date', 'pk')[:21]
+
+
+@hot_query('shopapp:feed')
+def latest_products():
+    return Product.objects.filter(archived=False).order_by('-creation_date')[:5]
+
+
+@hot_query('shopapp:products_last_modified')
+def products_last_modified():
+    return Product.objects.order_by('-modified_at').values_list('modified_at')[:1]
+
+
+@hot_query('shopapp:products_by_name')
+def products_by_name():
+    return Product.objects.filter(name='apple')
+
+
+@hot_query('shopapp:users_orders')
+def user_orders():
+    return Order.objects.filter(user_id=1).order_by('pk')
+
+
+@hot_query('shopapp:orders')
+def orders_list():
+    return Order.objects.order_by('-created_at', '-pk')[:20]
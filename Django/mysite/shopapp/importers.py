@@ -0,0 +1,127 @@
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from .aggregates import recompute_order_aggregates, recompute_product_aggregates
+from .caching import invalidate_user_orders
+from .models import Order, Product
+
+IMPORT_BATCH_SIZE = 1000
+PROMO_MAX_LENGTH = Order._meta.get_field('promo').max_length
+
+
+class OrderImportResult:
+
+    def __init__(self):
+        self.rows = 0
+        self.created = 0
+        self.errors = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+    def add_error(self, line, message):
+        self.errors.append((line, message))
+
+
+def _parse_ids(value):
+    return [int(pk) for pk in value.split(',') if pk.strip()]
+
+
+def _import_batch(batch, default_user, result):
+    parsed = []
+    user_ids = set()
+    product_ids = set()
+
+    for line, row in batch:
+        delivery_address = (row.get('delivery_address') or '').strip()
+        promo = row.get('promo') or ''
+        if not delivery_address:
+            result.add_error(line, 'Delivery address is required')
+            continue
+        if len(promo) > PROMO_MAX_LENGTH:
+            result.add_error(line, f'Promo is longer than {PROMO_MAX_LENGTH} characters')
+            continue
+        try:
+            products = _parse_ids(row.get('products') or '')
+        except ValueError:
+            result.add_error(line, f'Invalid product ids {row.get("products")!r}')
+            continue
+        if not products:
+            result.add_error(line, 'Order has no products')
+            continue
+
+        try:
+            user_id = int(row.get('user') or '')
+        except ValueError:
+            user_id = None
+
+        parsed.append((line, user_id, delivery_address, promo, products))
+        if user_id is not None:
+            user_ids.add(user_id)
+        product_ids.update(products)
+
+    known_users = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    known_products = set(Product.objects.filter(pk__in=product_ids).values_list('pk', flat=True))
+
+    orders = []
+    order_products = []
+    for line, user_id, delivery_address, promo, products in parsed:
+        unknown = [pk for pk in products if pk not in known_products]
+        if unknown:
+            result.add_error(line, f'Unknown products {", ".join(map(str, unknown))}')
+            continue
+        orders.append(Order(
+            delivery_address=delivery_address,
+            promo=promo,
+            user_id=user_id if user_id in known_users else default_user.pk,
+        ))
+        order_products.append(products)
+
+    if not orders:
+        return
+
+    through = Order.products.through
+    with transaction.atomic():
+        Order.objects.bulk_create(orders)
+        through.objects.bulk_create(
+            through(order_id=order.pk, product_id=product_id)
+            for order, products in zip(orders, order_products)
+            for product_id in dict.fromkeys(products)
+        )
+        # bulk_create sends no signals, so keep the stored aggregates in step here.
+        recompute_order_aggregates([order.pk for order in orders])
+        recompute_product_aggregates({pk for products in order_products for pk in products})
+    result.created += len(orders)
+    invalidate_user_orders(order.user_id for order in orders)
+
+
+def import_orders(rows, default_user, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import orders from CSV dict rows (user, delivery_address, promo, products).
+
+    Every batch resolves its users and products with one query each and is
+    written in its own transaction, so a large file never holds the write
+    lock for long. Invalid rows are reported in the result and skipped.
+    Rows with an unknown user are assigned to ``default_user``.
+    """
+    result = OrderImportResult()
+    started = perf_counter()
+    batch = []
+
+    # Line 1 is the CSV header.
+    for line, row in enumerate(rows, start=2):
+        result.rows += 1
+        batch.append((line, row))
+        if len(batch) >= batch_size:
+            _import_batch(batch, default_user, result)
+            batch = []
+    if batch:
+        _import_batch(batch, default_user, result)
+
+    result.errors.sort()
+    result.elapsed = perf_counter() - started
+    return result
@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.db import connection
+from django.test import RequestFactory
+from rest_framework.pagination import PageNumberPagination
+
+from mysite.benchmarks import rolled_back, summarize, time_calls
+from mysite.middleware import QueryCounter
+from mysite.pagination import KeysetPaginator
+
+from ...models import Product
+from ...pagination import ProductPagination
+from ...views import ProductListViewWithSerializer
+
+
+class Command(BaseCommand):
+    """
+    Compare a deep page of /shop/api/products/ with ?page= (OFFSET and COUNT)
+    and with the keyset cursor. All generated rows are rolled back.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page', type=int, default=1000)
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        page, page_size = options['page'], options['page_size']
+        factory = RequestFactory(HTTP_HOST='127.0.0.1')
+        ordering = ProductPagination.ordering
+
+        with rolled_back():
+            user = User.objects.create_user(username='benchmark-api-pagination')
+            missing = (page + 1) * page_size - Product.objects.count()
+            for start in range(0, max(missing, 0), options['batch_size']):
+                Product.objects.bulk_create(
+                    Product(name=f'bench {start + i}', price=1, created_by=user)
+                    for i in range(min(options['batch_size'], missing - start))
+                )
+
+            # The cursor a client following next links would hold on reaching the page.
+            last_of_previous = Product.objects.order_by(*ordering)[(page - 1) * page_size - 1]
+            cursor = KeysetPaginator(Product.objects.all(), ordering, page_size).encode_cursor(last_of_previous)
+            variants = {
+                'page number': (
+                    PageNumberPagination,
+                    {'page': page, 'ordering': ','.join(ordering)},
+                ),
+                'cursor': (ProductPagination, {'cursor': cursor}),
+                'cursor+count': (ProductPagination, {'cursor': cursor, 'count': 'approximate'}),
+            }
+
+            self.stdout.write(f'{"pagination":>14} {"queries":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+            for name, (pagination_class, params) in variants.items():
+                pagination_class = type('BenchmarkPagination', (pagination_class,), {'page_size': page_size})
+                view = ProductListViewWithSerializer.as_view({'get': 'list'}, pagination_class=pagination_class)
+                request = factory.get('/shop/api/products/', params)
+
+                counter = QueryCounter()
+                with connection.execute_wrapper(counter):
+                    response = view(request)
+                assert response.status_code == 200, response.data
+                stats = summarize(time_calls(lambda: view(request), options['repeat']))
+                self.stdout.write(
+                    f'{name:>14} {counter.count:>8} {stats["p50_ms"]:>9} {stats["p95_ms"]:>9} {stats["p99_ms"]:>9}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows rolled back'))
@@ -0,0 +1,153 @@
+import asyncio
+import random
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand
+from django.test import Client, RequestFactory
+from django.urls import reverse
+
+from mysite.benchmarks import summarize
+from mysite.handlers import AsyncViewsASGIHandler
+
+from ...aggregates import recompute_order_aggregates, recompute_product_aggregates
+from ...models import Order, Product
+
+HOST = '127.0.0.1'
+
+
+class Command(BaseCommand):
+    """
+    Compare requests/s and latency of the shop views served through the
+    WSGI handler (sync views, a thread per concurrent request) and the
+    mysite.asgi handler (their async versions, one event loop), in process
+    and at the same concurrency.
+
+    The generated rows are committed so every thread can read them, and
+    deleted when the command finishes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=200)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--concurrency', type=int, default=16)
+
+    def handle(self, *args, **options):
+        user = User.objects.create_user(username='benchmark-asgi')
+        try:
+            urls, cookie = self.prepare(user, options)
+            targets = [random.choice(urls) for _ in range(options['requests'])]
+
+            self.stdout.write(
+                f'{"handler":>8} {"requests":>9} {"errors":>7} {"req/s":>8} '
+                f'{"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}'
+            )
+            for name, run in (('wsgi', self.run_wsgi), ('asgi', self.run_asgi)):
+                started = perf_counter()
+                results = run(targets, cookie, options['concurrency'])
+                elapsed = perf_counter() - started
+                stats = summarize([latency for latency, _ in results])
+                errors = sum(1 for _, status in results if status >= 400)
+                self.stdout.write(
+                    f'{name:>8} {stats["count"]:>9} {errors:>7} {len(results) / elapsed:>8.0f} '
+                    f'{stats["p50_ms"]:>9} {stats["p95_ms"]:>9} {stats["p99_ms"]:>9}'
+                )
+        finally:
+            Order.objects.filter(user=user).delete()
+            Product.objects.filter(created_by=user).delete()
+            user.delete()
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows deleted'))
+
+    def prepare(self, user, options):
+        products = Product.objects.bulk_create(
+            (Product(name=f'bench {i}', price=i % 100, description='benchmark', created_by=user)
+             for i in range(options['products'])),
+            batch_size=1000,
+        )
+        orders = Order.objects.bulk_create(
+            Order(user=user, delivery_address=f'ul Bench, d {i}') for i in range(options['orders'])
+        )
+        through = Order.products.through
+        through.objects.bulk_create(
+            through(order_id=order.pk, product_id=product.pk)
+            for order in orders
+            for product in random.sample(products, 3)
+        )
+        recompute_order_aggregates([order.pk for order in orders])
+        recompute_product_aggregates([product.pk for product in products])
+
+        client = Client(HTTP_HOST=HOST)
+        client.force_login(user)
+        cookie = f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+        urls = [reverse('shopapp:products'), reverse('shopapp:feed'),
+                reverse('shopapp:users_orders_export', kwargs={'user_id': user.pk})]
+        urls += [reverse('shopapp:products_details', kwargs={'pk': product.pk})
+                 for product in random.sample(products, 20)]
+        return urls, cookie
+
+    def run_wsgi(self, targets, cookie, concurrency):
+        application = WSGIHandler()
+        factory = RequestFactory(HTTP_HOST=HOST, HTTP_COOKIE=cookie)
+
+        def request(url):
+            environ = factory.get(url).environ
+            status = []
+            started = perf_counter()
+            response = application(environ, lambda code, headers: status.append(int(code.split()[0])))
+            b''.join(response)
+            response.close()
+            return (perf_counter() - started) * 1000, status[0]
+
+        with ThreadPoolExecutor(concurrency) as pool:
+            return list(pool.map(request, targets))
+
+    def run_asgi(self, targets, cookie, concurrency):
+        application = AsyncViewsASGIHandler()
+
+        async def request(url, semaphore):
+            parts = urlsplit(url)
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': parts.path,
+                'raw_path': parts.path.encode(),
+                'query_string': parts.query.encode(),
+                'headers': [(b'host', HOST.encode()), (b'cookie', cookie.encode())],
+                'client': (HOST, 0),
+                'server': (HOST, 80),
+            }
+            received = False
+            status = []
+
+            async def receive():
+                nonlocal received
+                if received:
+                    # No disconnect; the handler cancels this once it has responded.
+                    await asyncio.Future()
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+
+            async with semaphore:
+                started = perf_counter()
+                await application(scope, receive, send)
+                return (perf_counter() - started) * 1000, status[0]
+
+        async def run():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(request(url, semaphore) for url in targets))
+
+        return asyncio.run(run())
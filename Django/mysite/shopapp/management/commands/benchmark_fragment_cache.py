@@ -0,0 +1,70 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.template import engines
+
+from mysite import fragment_cache
+from mysite.benchmarks import rolled_back, summarize, time_calls
+
+from ...models import Product
+
+ROW = (
+    '<li><a href="{% url \'shopapp:products_details\' pk=product.pk %}">'
+    '{{ product.name|capfirst }}</a> for {{ product.price }}</li>'
+)
+PLAIN = '{% for product in products %}' + ROW + '{% endfor %}'
+CACHED = (
+    '{% load fragment_cache %}{% for product in products %}'
+    '{% rowcache product %}' + ROW + '{% endrowcache %}{% endfor %}'
+)
+
+
+class Command(BaseCommand):
+    """
+    Render a product listing with and without per-row fragment caching.
+
+    All generated rows are rolled back when the command finishes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--changed', type=float, default=1.0,
+                            help='Percent of rows saved before the last warm render')
+
+    def handle(self, *args, **options):
+        engine = engines['django']
+        plain = engine.from_string(PLAIN)
+        cached = engine.from_string(CACHED)
+        label = Product._meta.label_lower
+
+        with rolled_back():
+            user = User.objects.create_user(username='benchmark-fragments')
+            Product.objects.bulk_create(
+                (Product(name=f'bench {i}', price=i % 100, created_by=user) for i in range(options['rows'])),
+                batch_size=5000,
+            )
+            products = list(Product.objects.filter(created_by=user).only('pk', 'name', 'price'))
+            context = {'products': products}
+
+            def run(name, template, repeat):
+                before = fragment_cache.stats.copy()
+                stats = summarize(time_calls(lambda: template.render(context), repeat))
+                hits = fragment_cache.stats[f'{label}:hit'] - before[f'{label}:hit']
+                misses = fragment_cache.stats[f'{label}:miss'] - before[f'{label}:miss']
+                self.stdout.write(
+                    f'{name:>10} {stats["p50_ms"]:>10} {stats["p95_ms"]:>10} {hits:>8} {misses:>8}'
+                )
+
+            self.stdout.write(f'{"render":>10} {"p50 ms":>10} {"p95 ms":>10} {"hits":>8} {"misses":>8}')
+            run('plain', plain, options['repeat'])
+            run('cold', cached, 1)
+            run('warm', cached, options['repeat'])
+
+            step = max(1, round(100 / options['changed'])) if options['changed'] else 0
+            for product in products[::step] if step else []:
+                product.price += 1
+                product.save(update_fields=['price'])
+            run('changed', cached, 1)
+            run('warm', cached, options['repeat'])
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows rolled back'))
@@ -0,0 +1,69 @@
+import random
+from time import perf_counter
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.db import connection
+from django.db.models import Prefetch
+
+from mysite.benchmarks import rolled_back
+from mysite.middleware import QueryCounter
+
+from ...models import Order, Product
+from ...serializers import OrderReadSerializer, OrderSerializer
+
+
+class Command(BaseCommand):
+    """
+    Measure orders/s serialized for /shop/api/orders/ with the ModelSerializer
+    and with the read serializer. All generated rows are rolled back.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=5000)
+        parser.add_argument('--products-per-order', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            user = User.objects.create_user(username='benchmark-serializers')
+            products = Product.objects.bulk_create(
+                Product(name=f'bench {i}', price=i + 1, created_by=user) for i in range(200)
+            )
+            orders = Order.objects.bulk_create(
+                (Order(user=user, delivery_address=f'ul Bench, d {i}') for i in range(options['orders'])),
+                batch_size=1000,
+            )
+            through = Order.products.through
+            through.objects.bulk_create(
+                (through(order_id=order.pk, product_id=product.pk)
+                 for order in orders
+                 for product in random.sample(products, options['products_per_order'])),
+                batch_size=5000,
+            )
+
+            queryset = Order.objects.filter(user=user).order_by('pk')
+            variants = {
+                'model': lambda: OrderSerializer(queryset.all(), many=True).data,
+                'model+prefetch': lambda: OrderSerializer(
+                    queryset.prefetch_related(Prefetch('products', queryset=Product.objects.only('pk'))),
+                    many=True,
+                ).data,
+                'read': lambda: OrderReadSerializer(queryset.only(*OrderReadSerializer.columns), many=True).data,
+            }
+
+            self.stdout.write(f'{"serializer":>16} {"queries":>8} {"seconds":>9} {"orders/s":>10}')
+            for name, serialize in variants.items():
+                best = None
+                for _ in range(options['repeat']):
+                    counter = QueryCounter()
+                    with connection.execute_wrapper(counter):
+                        started = perf_counter()
+                        serialize()
+                        elapsed = perf_counter() - started
+                    best = elapsed if best is None else min(best, elapsed)
+                self.stdout.write(
+                    f'{name:>16} {counter.count:>8} {best:>9.3f} {options["orders"] / best:>10.0f}'
+                )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows rolled back'))
@@ -0,0 +1,71 @@
+import random
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.db.models import Q
+
+from mysite.benchmarks import rolled_back, summarize, time_calls
+
+from ...models import Product
+from ...search import get_search_backend
+
+WORDS = (
+    'apple banana cherry grape lemon mango orange peach pear plum fresh ripe sweet sour '
+    'green red yellow organic local imported juicy crisp dried frozen large small'
+).split()
+
+
+class Command(BaseCommand):
+    """
+    Compare the icontains SearchFilter query with the full-text search backend
+    for one paginated API page.
+
+    All generated rows are rolled back when the command finishes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        backend = get_search_backend()
+        queries = ['batch4242', 'sweet orange', 'juic']
+
+        with rolled_back():
+            user = User.objects.create_user(username='benchmark-search')
+            Product.objects.bulk_create(
+                (
+                    Product(
+                        name=' '.join(rng.choices(WORDS, k=2))[:15],
+                        # Common words plus a rare batch code, so both kinds of terms are measured.
+                        description=' '.join(rng.choices(WORDS, k=12)) + f' batch{rng.randrange(50000)}',
+                        created_by=user,
+                    )
+                    for _ in range(options['products'])
+                ),
+                batch_size=5000,
+            )
+            backend.rebuild()
+
+            self.stdout.write(f'{options["products"]} products, backend {type(backend).__name__}')
+            self.stdout.write(f'{"query":>14} {"method":>10} {"p50 ms":>9} {"p95 ms":>9}')
+            for query in queries:
+                # What SearchFilter(search_fields=name, description, price) ran before.
+                icontains = Product.objects.all()
+                for term in query.split():
+                    icontains = icontains.filter(
+                        Q(name__icontains=term) | Q(description__icontains=term) | Q(price__icontains=term)
+                    )
+                fulltext = backend.search(Product.objects.all(), query)
+                # The API runs a COUNT for the paginator and then fetches one page.
+                methods = {
+                    'icontains': lambda: (icontains.count(), list(icontains[:10])),
+                    'fulltext': lambda: (fulltext.count(), list(fulltext[:10])),
+                }
+                for method, func in methods.items():
+                    stats = summarize(time_calls(func, options['repeat']))
+                    self.stdout.write(f'{query:>14} {method:>10} {stats["p50_ms"]:>9} {stats["p95_ms"]:>9}')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows rolled back'))
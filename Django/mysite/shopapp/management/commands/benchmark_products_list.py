@@ -0,0 +1,59 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand
+from django.test import Client
+from django.urls import reverse
+
+from mysite.benchmarks import rolled_back, summarize, time_calls
+from mysite.pagination import KeysetPaginator
+
+from ...models import Product
+from ...views import ProductsListView
+
+
+class Command(BaseCommand):
+    """
+    Measure /shop/products latency while the catalog grows.
+
+    All generated rows are rolled back when the command finishes.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default='1000,10000,100000',
+                            help='Comma separated catalog sizes to measure')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        client = Client(HTTP_HOST='127.0.0.1')
+        url = reverse('shopapp:products')
+
+        self.stdout.write(f'{"rows":>10} {"page":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+        with rolled_back():
+            user = User.objects.create_user(username='benchmark-products')
+            created = 0
+            for size in sizes:
+                while created < size:
+                    batch = min(options['batch_size'], size - created)
+                    Product.objects.bulk_create(
+                        Product(name=f'bench {created + i}', price=1, created_by=user)
+                        for i in range(batch)
+                    )
+                    created += batch
+
+                queryset = ProductsListView().get_queryset()
+                paginator = KeysetPaginator(queryset, ProductsListView.ordering, ProductsListView.paginate_by)
+                middle = queryset.order_by(*ProductsListView.ordering)[size // 2]
+                last = queryset.order_by(*ProductsListView.ordering).last()
+                pages = {
+                    'first': {},
+                    'middle': {'cursor': paginator.encode_cursor(middle)},
+                    'last': {'cursor': paginator.encode_cursor(last, 'prev')},
+                }
+                for page, params in pages.items():
+                    stats = summarize(time_calls(lambda: client.get(url, params), options['repeat']))
+                    self.stdout.write(
+                        f'{size:>10} {page:>8} {stats["p50_ms"]:>9} {stats["p95_ms"]:>9} {stats["p99_ms"]:>9}'
+                    )
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished, generated rows rolled back'))
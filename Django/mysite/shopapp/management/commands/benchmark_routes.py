@@ -0,0 +1,284 @@
+import json
+import platform
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from fnmatch import fnmatch
+from http.cookiejar import CookieJar
+from time import perf_counter
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+import django
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.urls import NoReverseMatch, URLResolver, get_resolver, reverse
+
+from blogapp.models import Article, Category, Tag
+from mysite.benchmarks import compare_reports, server_timing_queries, summarize
+from mysite.sitemaps import sitemaps
+from myauth.models import Profile
+
+from ...models import Order, Product
+
+ROUTE_NAMESPACES = ('shopapp', 'myauth', 'blogapp')
+EXTRA_ROUTES = ('sitemaps', 'sitemap_section')
+# A GET to these changes state.
+SKIPPED_ROUTES = {'myauth:logout'}
+
+
+def named_routes(patterns=None, namespace=None):
+    """
+    Names of all URL patterns, namespaced the way reverse() expects them.
+    """
+    if patterns is None:
+        patterns = get_resolver().url_patterns
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            inner = ':'.join(filter(None, (namespace, pattern.namespace)))
+            yield from named_routes(pattern.url_patterns, inner or None)
+        elif pattern.name:
+            yield f'{namespace}:{pattern.name}' if namespace else pattern.name
+
+
+def sample_kwargs(user):
+    """
+    URL arguments of routes that need them, taken from the first matching rows.
+    None marks a route with no row to show.
+    """
+    product = Product.objects.order_by('pk').only('pk').first()
+    order = Order.objects.order_by('pk').only('pk', 'user_id').first()
+    other = User.objects.exclude(pk=user.pk).order_by('pk').only('pk').first() if user else None
+    avatar = Profile.objects.exclude(avatar='').exclude(avatar__isnull=True).only('user_id').first()
+    category = Category.objects.order_by('pk').only('pk').first()
+    tag = Tag.objects.order_by('pk').only('pk').first()
+
+    kwargs = {
+        'myauth:user_details': other and {'pk': other.pk},
+        'myauth:new_avatar': user and {'pk': user.pk},
+        'myauth:avatar': avatar and {'pk': avatar.user_id, 'size': 128, 'fmt': 'webp'},
+        'blogapp:articles_by_category': category and {'category_id': category.pk},
+        'blogapp:articles_by_tag': tag and {'tag_id': tag.pk},
+        'shopapp:users_orders': order and {'user_id': order.user_id},
+        'shopapp:users_orders_export': order and {'user_id': order.user_id},
+        'sitemap_section': {'section': next(iter(sitemaps))},
+    }
+    for name in ('products_details', 'products_update', 'product_delete', 'product-detail'):
+        kwargs[f'shopapp:{name}'] = product and {'pk': product.pk}
+    for name in ('order_details', 'order_update', 'order_delete', 'order-detail'):
+        kwargs[f'shopapp:{name}'] = order and {'pk': order.pk}
+    return kwargs
+
+
+class InProcessClient:
+    """
+    Django test client per thread, logged in as ``user``.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._local = threading.local()
+
+    def get(self, url):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = Client(HTTP_HOST='127.0.0.1')
+            if self.user:
+                client.force_login(self.user)
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        queries = server_timing_queries(response.get('Server-Timing'))
+        if queries is None:
+            queries = getattr(response, 'request_metrics', {}).get('queries')
+        return response.status_code, queries
+
+
+class NoRedirect(HTTPRedirectHandler):
+
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class RemoteClient:
+    """
+    urllib client for a running server, sharing one session cookie across threads.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.cookies = CookieJar()
+        self._local = threading.local()
+
+    def _open(self, request):
+        opener = getattr(self._local, 'opener', None)
+        if opener is None:
+            opener = self._local.opener = build_opener(HTTPCookieProcessor(self.cookies), NoRedirect())
+        try:
+            with opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status, response.headers
+        except HTTPError as error:
+            error.read()
+            return error.code, error.headers
+
+    def get(self, url):
+        status, headers = self._open(self.base_url + url)
+        return status, server_timing_queries(headers.get('Server-Timing'))
+
+    def login(self, username, password):
+        url = self.base_url + reverse('myauth:login')
+        self._open(url)
+        token = next((cookie.value for cookie in self.cookies if cookie.name == settings.CSRF_COOKIE_NAME), '')
+        data = urlencode({'username': username, 'password': password, 'csrfmiddlewaretoken': token})
+        status, _ = self._open(Request(url, data=data.encode(), headers={'Referer': url}))
+        if status != 302:
+            raise CommandError(f'Could not log in as {username!r} (status {status})')
+
+
+def run_route(executor, client, url, requests, warmup):
+    def timed(_):
+        started = perf_counter()
+        status, queries = client.get(url)
+        return (perf_counter() - started) * 1000, status, queries
+
+    list(executor.map(timed, range(warmup)))
+    started = perf_counter()
+    results = list(executor.map(timed, range(requests)))
+    elapsed = perf_counter() - started
+
+    statuses = Counter(status for _, status, _ in results)
+    queries = [count for _, _, count in results if count is not None]
+    return {
+        'url': url,
+        'status': statuses.most_common(1)[0][0],
+        'errors': sum(count for status, count in statuses.items() if status >= 500),
+        'rps': round(requests / elapsed, 1),
+        **summarize([ms for ms, _, _ in results]),
+        'queries': max(queries) if queries else None,
+    }
+
+
+class Command(BaseCommand):
+    """
+    Benchmark every named route of shopapp, myauth, blogapp (with the DRF
+    router) and the sitemaps with concurrent GET requests.
+
+    Runs in-process through the test client, or with --base-url against a
+    running server (gunicorn) that uses the same database: URL arguments
+    are sample rows read from it, so fill it with generate_load_data first.
+    Query counts come from the Server-Timing header of RequestMetricsMiddleware.
+
+    --output writes a JSON report. --baseline compares with a saved one and
+    fails on routes slower (p95) by more than --threshold, with more queries
+    or another status.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', help='Benchmark a running server instead of in-process')
+        parser.add_argument('--username', help='User to log in as, defaults to the first superuser')
+        parser.add_argument('--password', help='Password of --username, needed with --base-url')
+        parser.add_argument('--anonymous', action='store_true', help='Do not log in')
+        parser.add_argument('--routes', default='*', help='Comma separated fnmatch patterns of route names')
+        parser.add_argument('--requests', type=int, default=50, help='Requests per route')
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--warmup', type=int, default=2, help='Untimed requests per route')
+        parser.add_argument('--output', help='Write the JSON report here')
+        parser.add_argument('--baseline', help='JSON report to compare with')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Allowed p95 slowdown as a fraction')
+
+    def get_user(self, options):
+        if options['anonymous']:
+            return None
+        users = User.objects.filter(is_active=True)
+        if options['username']:
+            users = users.filter(username=options['username'])
+        else:
+            users = users.filter(is_superuser=True).order_by('pk')
+        user = users.first()
+        if user is None:
+            raise CommandError('No user to log in as, pass --username or --anonymous')
+        return user
+
+    def handle(self, *args, **options):
+        user = self.get_user(options)
+        if options['base_url']:
+            client = RemoteClient(options['base_url'])
+            if user:
+                if not options['password']:
+                    raise CommandError('--password is needed to log in to --base-url')
+                client.login(user.username, options['password'])
+        else:
+            client = InProcessClient(user)
+
+        patterns = options['routes'].split(',')
+        kwargs = sample_kwargs(user)
+        routes = {}
+        for name in dict.fromkeys(named_routes()):
+            if (
+                name in SKIPPED_ROUTES
+                or not (name.split(':')[0] in ROUTE_NAMESPACES or name in EXTRA_ROUTES)
+                or not any(fnmatch(name, pattern) for pattern in patterns)
+            ):
+                continue
+            if name in kwargs and kwargs[name] is None:
+                self.stderr.write(f'Skipping {name}: no sample row')
+                continue
+            try:
+                routes[name] = reverse(name, kwargs=kwargs.get(name))
+            except NoReverseMatch:
+                self.stderr.write(f'Skipping {name}: no sample arguments')
+
+        report = {
+            'meta': {
+                'started_at': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'target': options['base_url'] or 'in-process',
+                'user': user.username if user else None,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'dataset': {
+                    'users': User.objects.count(),
+                    'products': Product.objects.count(),
+                    'orders': Order.objects.count(),
+                    'articles': Article.objects.count(),
+                },
+            },
+            'routes': {},
+        }
+
+        self.stdout.write(
+            f'{"route":<34} {"status":>6} {"req/s":>8} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"queries":>8}'
+        )
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            for name, url in routes.items():
+                result = run_route(executor, client, url, options['requests'], options['warmup'])
+                report['routes'][name] = result
+                self.stdout.write(
+                    f'{name:<34} {result["status"]:>6} {result["rps"]:>8} {result["p50_ms"]:>9} '
+                    f'{result["p95_ms"]:>9} {result["p99_ms"]:>9} {str(result["queries"]):>8}'
+                )
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f'Report written to {options["output"]}')
+
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                baseline = json.load(f)
+            regressions = compare_reports(baseline, report, options['threshold'])
+            for route, metric, before, after in regressions:
+                self.stderr.write(f'{route}: {metric} {before} -> {after}')
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(f'No regressions against {options["baseline"]}')
+
+        self.stdout.write(self.style.SUCCESS('Benchmark finished'))
@@ -0,0 +1,86 @@
+import os
+import sqlite3
+import tempfile
+from multiprocessing import Pool
+from time import perf_counter
+
+from django.conf import settings
+from django.core.management import BaseCommand
+
+SCHEMA = 'CREATE TABLE bench_order (id INTEGER PRIMARY KEY, worker INTEGER, line INTEGER, total INTEGER)'
+
+
+def _write(path, worker, writes, tuned):
+    """
+    One gunicorn worker: every write reads, then inserts in one transaction.
+    """
+    ok = locked = 0
+    connection = None
+    for line in range(writes):
+        try:
+            if connection is None:
+                if tuned:
+                    connection = sqlite3.connect(path, isolation_level=None)
+                    for name, value in settings.SQLITE_PRAGMAS.items():
+                        connection.execute(f'PRAGMA {name}={value}')
+                else:
+                    # Django's defaults: a new connection per request, deferred transactions.
+                    connection = sqlite3.connect(path, isolation_level=None)
+            connection.execute('BEGIN IMMEDIATE' if tuned else 'BEGIN')
+            try:
+                total = connection.execute('SELECT COUNT(*) FROM bench_order WHERE worker = ?', (worker,)).fetchone()[0]
+                connection.execute(
+                    'INSERT INTO bench_order (worker, line, total) VALUES (?, ?, ?)',
+                    (worker, line, total),
+                )
+                connection.execute('COMMIT')
+            except sqlite3.OperationalError:
+                connection.execute('ROLLBACK')
+                raise
+            ok += 1
+        except sqlite3.OperationalError as exc:
+            if 'locked' not in str(exc) and 'busy' not in str(exc):
+                raise
+            locked += 1
+        finally:
+            if not tuned and connection is not None:
+                connection.close()
+                connection = None
+    if connection is not None:
+        connection.close()
+    return ok, locked
+
+
+class Command(BaseCommand):
+    """
+    Measure SQLite write throughput with concurrent worker processes,
+    with Django's default connection handling and with SQLITE_PRAGMAS,
+    persistent connections and BEGIN IMMEDIATE.
+
+    Runs against a temporary database file, never the project database.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=500, help='Writes per worker')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"mode":>8} {"writes":>8} {"locked":>8} {"seconds":>9} {"writes/s":>10}')
+        for mode, tuned in (('before', False), ('after', True)):
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, 'bench.sqlite3')
+                with sqlite3.connect(path) as connection:
+                    connection.execute(SCHEMA)
+                connection.close()
+
+                started = perf_counter()
+                with Pool(options['workers']) as pool:
+                    results = pool.starmap(
+                        _write,
+                        [(path, worker, options['writes'], tuned) for worker in range(options['workers'])],
+                    )
+                elapsed = perf_counter() - started
+
+            ok = sum(result[0] for result in results)
+            locked = sum(result[1] for result in results)
+            self.stdout.write(f'{mode:>8} {ok:>8} {locked:>8} {elapsed:>9.2f} {ok / elapsed:>10.0f}')
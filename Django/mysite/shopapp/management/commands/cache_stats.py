@@ -0,0 +1,60 @@
+from collections import Counter
+
+from django.core.cache import caches
+from django.core.management import BaseCommand, CommandError
+
+from mysite.cache_backends import TieredCache
+
+
+class Command(BaseCommand):
+    """
+    Show hit and miss counters per key prefix, summed over all processes
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--alias', default='default')
+        parser.add_argument('--per-process', action='store_true')
+        parser.add_argument('--reset', action='store_true', help='Drop the collected counters')
+
+    def handle(self, *args, **options):
+        cache = caches[options['alias']]
+        if not isinstance(cache, TieredCache):
+            raise CommandError(f'Cache {options["alias"]!r} is not a TieredCache')
+
+        if options['reset']:
+            cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('Cache stats reset'))
+            return
+
+        processes = cache.collect_stats()
+        if options['per_process']:
+            for stats_id, snapshot in sorted(processes.items()):
+                self.stdout.write(
+                    f'{stats_id}: L1 {snapshot.get("l1_entries", 0)} entries, '
+                    f'{snapshot.get("l1_bytes", 0) / 1024:.0f} KiB'
+                )
+                self.write_table(snapshot)
+        else:
+            total = Counter()
+            for snapshot in processes.values():
+                total.update(snapshot)
+            self.stdout.write(f'Processes: {len(processes)}')
+            self.write_table(total)
+
+    def write_table(self, snapshot):
+        rows = {}
+        for name, count in snapshot.items():
+            if '|' in name:
+                prefix, event = name.split('|', 1)
+                rows.setdefault(prefix, Counter())[event] += count
+
+        self.stdout.write(
+            f'{"prefix":<24} {"l1 hits":>9} {"l2 hits":>9} {"misses":>9} {"sets":>9} {"hit %":>7}'
+        )
+        for prefix, counts in sorted(rows.items()):
+            reads = counts['l1_hit'] + counts['l2_hit'] + counts['miss']
+            ratio = (counts['l1_hit'] + counts['l2_hit']) / reads * 100 if reads else 0.0
+            self.stdout.write(
+                f'{prefix:<24} {counts["l1_hit"]:>9} {counts["l2_hit"]:>9} '
+                f'{counts["miss"]:>9} {counts["set"]:>9} {ratio:>6.1f}%'
+            )
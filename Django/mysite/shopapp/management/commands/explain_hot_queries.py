@@ -0,0 +1,47 @@
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+
+from mysite.hot_queries import autodiscover
+
+
+def uses_index(plan, vendor):
+    if vendor == 'sqlite':
+        # "SCAN table" without "USING ..." is a full table scan and a temp
+        # b-tree means the ORDER BY is sorted instead of read from an index.
+        steps = [line for line in plan.splitlines() if ' SCAN ' in f' {line} ' or 'SEARCH ' in line]
+        return all('USING' in step for step in steps) and 'USE TEMP B-TREE' not in plan
+    return 'Seq Scan' not in plan
+
+
+class Command(BaseCommand):
+    """
+    Run EXPLAIN for every registered hot query and report whether it uses an index
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('names', nargs='*', help='Only explain these queries')
+        parser.add_argument('--verbose-plans', action='store_true', help='Print the full plan of every query')
+
+    def handle(self, *args, **options):
+        queries = autodiscover()
+        names = options['names'] or sorted(queries)
+        unknown = set(names) - set(queries)
+        if unknown:
+            raise CommandError(f'Unknown hot queries: {", ".join(sorted(unknown))}')
+
+        failed = []
+        for name in names:
+            plan = queries[name]().explain()
+            ok = uses_index(plan, connection.vendor)
+            if ok:
+                self.stdout.write(f'{self.style.SUCCESS("INDEX")}    {name}')
+            else:
+                failed.append(name)
+                self.stdout.write(f'{self.style.ERROR("NO INDEX")} {name}')
+            if options['verbose_plans'] or not ok:
+                for line in plan.splitlines():
+                    self.stdout.write(f'           {line}')
+
+        if failed:
+            raise CommandError(f'{len(failed)} hot queries do not use an index: {", ".join(failed)}')
+        self.stdout.write(self.style.SUCCESS(f'All {len(names)} hot queries use an index'))
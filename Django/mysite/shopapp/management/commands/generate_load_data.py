@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError, call_command
+from django.db import connection
+
+from blogapp.caching import bump_articles_version
+from mysite.load_data import PASSWORD, Plan, generate
+
+from ...caching import invalidate_products_last_modified
+
+
+class Command(BaseCommand):
+    """
+    Fill the database with seeded synthetic users, products, orders and
+    blog articles for load testing. The same seed gives the same data.
+
+    Product popularity in orders follows a Zipf distribution. All users
+    share one password, hashed once.
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=10000)
+        parser.add_argument('--orders', type=int, default=100000)
+        parser.add_argument('--lines-per-order', type=int, default=3, help='Average products per order')
+        parser.add_argument('--zipf', type=float, default=1.1, help='Zipf exponent of product popularity')
+        parser.add_argument('--authors', type=int, default=None, help='Defaults to articles / 20')
+        parser.add_argument('--categories', type=int, default=20)
+        parser.add_argument('--tags', type=int, default=200)
+        parser.add_argument('--articles', type=int, default=10000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Processes per stage; SQLite still writes one transaction at a time')
+
+    def handle(self, *args, **options):
+        authors = options['authors']
+        if authors is None:
+            authors = max(1, options['articles'] // 20) if options['articles'] else 0
+        plan = Plan(
+            seed=options['seed'],
+            users=options['users'],
+            products=options['products'],
+            orders=options['orders'],
+            authors=authors,
+            categories=options['categories'],
+            tags=options['tags'],
+            articles=options['articles'],
+            lines_per_order=options['lines_per_order'],
+            zipf_s=options['zipf'],
+            batch_size=options['batch_size'],
+        )
+        sizes = plan.sizes
+        if (sizes['products'] or sizes['orders']) and not sizes['users']:
+            raise CommandError('Products and orders need --users')
+        if sizes['orders'] and not sizes['products']:
+            raise CommandError('Orders need --products')
+        if sizes['articles'] and not (sizes['authors'] and sizes['categories']):
+            raise CommandError('Articles need --authors and --categories')
+        if User.objects.filter(username=f'load-{plan.seed}-0').exists():
+            raise CommandError(f'Seed {plan.seed} was already loaded, pass another --seed')
+
+        self.stdout.write(f'Generating on {connection.vendor} with seed {plan.seed}')
+        self.stdout.write(f'{"stage":>12} {"rows":>10} {"seconds":>9} {"rows/s":>10}')
+
+        def report(kind, rows, elapsed):
+            self.stdout.write(f'{kind:>12} {rows:>10} {elapsed:>9.2f} {rows / elapsed if elapsed else 0:>10.0f}')
+
+        generate(plan, workers=options['workers'], report=report)
+
+        # bulk_create() skips the signals that keep these up to date.
+        call_command('recompute_aggregates', stdout=self.stdout)
+        call_command('rebuild_search_index', stdout=self.stdout)
+        invalidate_products_last_modified()
+        bump_articles_version()
+
+        self.stdout.write(self.style.SUCCESS(f'Load data generated, users log in with password {PASSWORD!r}'))
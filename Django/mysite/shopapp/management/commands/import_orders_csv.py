@@ -0,0 +1,39 @@
+from csv import DictReader
+
+from django.contrib.auth.models import User
+from django.core.management import BaseCommand, CommandError
+
+from ...importers import IMPORT_BATCH_SIZE, import_orders
+
+
+class Command(BaseCommand):
+    """
+    Import orders from a CSV file with user, delivery_address, promo and products columns
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--user', required=True,
+                            help='Username that owns rows with a missing or unknown user')
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+        parser.add_argument('--encoding', default='utf-8')
+
+    def handle(self, *args, **options):
+        try:
+            default_user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f'User {options["user"]!r} does not exist')
+
+        self.stdout.write(f'Start import orders from {options["csv_path"]}')
+
+        with open(options['csv_path'], newline='', encoding=options['encoding']) as csv_file:
+            result = import_orders(DictReader(csv_file), default_user, batch_size=options['batch_size'])
+
+        for line, error in result.errors:
+            self.stderr.write(f'Line {line}: {error}')
+
+        self.stdout.write(
+            f'Rows: {result.rows}, created: {result.created}, skipped: {len(result.errors)}, '
+            f'time: {result.elapsed:.2f}s, throughput: {result.rows_per_second:.0f} rows/s'
+        )
+        self.stdout.write(self.style.SUCCESS('Import finished'))
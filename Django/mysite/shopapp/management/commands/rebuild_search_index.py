@@ -0,0 +1,15 @@
+from django.core.management import BaseCommand
+
+from ...search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Rebuild the product full-text search index
+    """
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        self.stdout.write(f'Rebuilding index with {type(backend).__name__}')
+        backend.rebuild()
+        self.stdout.write(self.style.SUCCESS('Search index rebuilt'))
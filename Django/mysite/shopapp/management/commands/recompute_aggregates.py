@@ -0,0 +1,42 @@
+from time import perf_counter
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Max, Min
+
+from ...aggregates import order_aggregates, product_aggregates
+from ...models import Order, Product
+
+
+class Command(BaseCommand):
+    """
+    Rebuild Order.total_amount, Order.item_count and Product.orders_count
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=10000,
+                            help='Rows updated per transaction')
+
+    def recompute(self, model, updates, batch_size):
+        started = perf_counter()
+        bounds = model.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        updated = 0
+        if bounds['low'] is not None:
+            for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+                with transaction.atomic():
+                    updated += (
+                        model.objects
+                        .filter(pk__gte=start, pk__lt=start + batch_size)
+                        .update(**updates)
+                    )
+        elapsed = perf_counter() - started
+        self.stdout.write(
+            f'{model._meta.verbose_name_plural}: {updated} rows in {elapsed:.2f}s '
+            f'({updated / elapsed if elapsed else 0:.0f} rows/s)'
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write('Start recompute aggregates')
+        self.recompute(Order, order_aggregates(), options['batch_size'])
+        self.recompute(Product, product_aggregates(), options['batch_size'])
+        self.stdout.write(self.style.SUCCESS('Aggregates recomputed'))
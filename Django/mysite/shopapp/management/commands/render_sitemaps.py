@@ -0,0 +1,43 @@
+import os
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.test import RequestFactory
+
+from mysite.sitemaps import render_sitemap, sitemap_filename, sitemaps
+from shopapp.caching import products_version
+
+
+class Command(BaseCommand):
+    """
+    Pre-render sitemap.xml and every section page to SITEMAP_ROOT
+    """
+
+    def add_arguments(self, parser):
+        parser.add_argument('--domain', required=True, help='Host used in sitemap URLs, e.g. example.com')
+        parser.add_argument('--scheme', default='https', choices=['http', 'https'])
+
+    def write(self, filename, content):
+        path = settings.SITEMAP_ROOT / filename
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_bytes(content)
+        os.replace(tmp_path, path)
+        self.stdout.write(f'Written {path}')
+
+    def handle(self, *args, **options):
+        settings.SITEMAP_ROOT.mkdir(parents=True, exist_ok=True)
+        # Files older than the products version are not served, so make sure it exists first.
+        products_version()
+        factory = RequestFactory(HTTP_HOST=options['domain'])
+        secure = options['scheme'] == 'https'
+
+        for section, site in sitemaps.items():
+            num_pages = site().paginator.num_pages
+            for page in range(1, num_pages + 1):
+                request = factory.get(f'/sitemap-{section}.xml', {'p': page}, secure=secure)
+                self.write(sitemap_filename(section, page), render_sitemap(request, section))
+
+        # The index goes last so it never points at a section that is not written yet.
+        self.write(sitemap_filename(), render_sitemap(factory.get('/sitemap.xml', secure=secure)))
+
+        self.stdout.write(self.style.SUCCESS('Sitemaps rendered'))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:30
+
+from django.db import migrations, models
+
+
+def copy_creation_date(apps, schema_editor):
+    Product = apps.get_model('shopapp', 'Product')
+    Product.objects.update(modified_at=models.F('creation_date'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0008_alter_order_options_alter_product_options'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='modified_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(copy_creation_date, migrations.RunPython.noop),
+    ]
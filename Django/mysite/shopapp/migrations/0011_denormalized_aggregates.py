@@ -0,0 +1,58 @@
+# Generated by Django 5.2.4 on 2026-10-18 15:33
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce, Round
+
+
+def fill_aggregates(apps, schema_editor):
+    Order = apps.get_model('shopapp', 'Order')
+    Product = apps.get_model('shopapp', 'Product')
+    Through = Order.products.through
+    total_field = models.DecimalField(max_digits=12, decimal_places=2)
+    line_price = models.ExpressionWrapper(
+        models.F('product__price') * (100 - models.F('product__discount')) * models.Value(Decimal('0.01')),
+        output_field=total_field,
+    )
+
+    order_lines = Through.objects.filter(order_id=models.OuterRef('pk')).values('order_id')
+    Order.objects.update(
+        total_amount=Coalesce(
+            models.Subquery(order_lines.annotate(total=Round(models.Sum(line_price), 2, output_field=total_field)).values('total')),
+            models.Value(Decimal('0.00')),
+            output_field=total_field,
+        ),
+        item_count=Coalesce(models.Subquery(order_lines.annotate(count=models.Count('pk')).values('count')), 0),
+    )
+
+    product_lines = Through.objects.filter(product_id=models.OuterRef('pk')).values('product_id')
+    Product.objects.update(
+        orders_count=Coalesce(models.Subquery(product_lines.annotate(count=models.Count('pk')).values('count')), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0010_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='item_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='order',
+            name='total_amount',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='orders_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+import django.db.models.deletion
+import shopapp.fields
+from django.db import migrations, models
+
+
+def create_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE shopapp_product_fts USING fts5("
+        "name, description, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO shopapp_product_fts (rowid, name, description) "
+        "SELECT id, name, COALESCE(description, '') FROM shopapp_product WHERE NOT archived"
+    )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS shopapp_product_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shopapp', '0011_denormalized_aggregates'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_table, drop_fts_table),
+        migrations.CreateModel(
+            name='ProductSearchEntry',
+            fields=[
+                ('product', models.OneToOneField(db_column='rowid', on_delete=django.db.models.deletion.DO_NOTHING, primary_key=True, related_name='search_entry', serialize=False, to='shopapp.product')),
+                ('name', models.TextField()),
+                ('description', models.TextField()),
+                ('document', shopapp.fields.FullTextDocumentField(db_column='shopapp_product_fts')),
+                ('rank', models.FloatField()),
+            ],
+            options={
+                'db_table': 'shopapp_product_fts',
+                'managed': False,
+            },
+        ),
+    ]
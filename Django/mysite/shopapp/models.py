@@ -1,13 +1,26 @@
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Q
 from django.urls import reverse
 from django.utils.translation import gettext_lazy as _
 
+from .fields import FullTextDocumentField
+
 class Product(models.Model):
     class Meta:
         verbose_name = _("Product")
         verbose_name_plural = _("Products")
+        indexes = [
+            models.Index(
+                fields=['creation_date', 'id'],
+                condition=Q(archived=False),
+                name='product_active_created_idx',
+            ),
+            # The API lists archived products too.
+            models.Index(fields=['creation_date', 'id'], name='product_created_idx'),
+            models.Index(fields=['name'], name='product_name_idx'),
+        ]
 
 
     name = models.CharField(max_length=15)
@@ -16,7 +29,9 @@ class Product(models.Model):
             MinValueValidator(0),])
     discount = models.PositiveSmallIntegerField(default=0,validators=[MaxValueValidator(100),])
     creation_date = models.DateTimeField(auto_now_add = True)
+    modified_at = models.DateTimeField(auto_now=True, db_index=True)
     archived = models.BooleanField(default=False)
+    orders_count = models.PositiveIntegerField(default=0, editable=False)
     created_by = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -29,17 +44,47 @@ class Product(models.Model):
     def get_absolute_url(self):
         return reverse('shopapp:products_details', kwargs={'pk': self.pk})
 
+
+class ProductSearchEntry(models.Model):
+    """
+    Row of the SQLite FTS5 table used by shopapp.search.SQLiteFTS5Backend.
+
+    Only joined from Product to filter and rank, the rows are written by the backend.
+    """
+
+    class Meta:
+        managed = False
+        db_table = 'shopapp_product_fts'
+
+    product = models.OneToOneField(
+        Product,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column='rowid',
+        related_name='search_entry',
+    )
+    name = models.TextField()
+    description = models.TextField()
+    document = FullTextDocumentField(db_column='shopapp_product_fts')
+    rank = models.FloatField()
+
 class Order(models.Model):
 
     class Meta:
         verbose_name = _("Order")
         verbose_name_plural = _("Orders")
+        indexes = [
+            models.Index(fields=['user', 'id'], name='order_user_pk_idx'),
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+        ]
 
     delivery_address = models.TextField()
     promo = models.CharField(max_length=15, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.PROTECT)
     products = models.ManyToManyField(Product, related_name='orders')
+    total_amount = models.DecimalField(default=0, max_digits=12, decimal_places=2, editable=False)
+    item_count = models.PositiveIntegerField(default=0, editable=False)
 
     def __str__(self):
         return f'Order for user {self.user.first_name or self.user.username!r}'
\ No newline at end of file
@@ -0,0 +1,11 @@
+from mysite.pagination import KeysetPagination
+
+
+class ProductPagination(KeysetPagination):
+    # Newest first, on the product_created_idx index.
+    ordering = ('-creation_date', '-pk')
+
+
+class OrderPagination(KeysetPagination):
+    # Newest first, on the order_created_idx index.
+    ordering = ('-created_at', '-pk')
@@ -0,0 +1,120 @@
+import re
+from functools import reduce
+from operator import or_
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from .models import Product
+
+
+class ProductSearchBackend:
+    """
+    Full-text index over Product.name and Product.description.
+
+    Archived products are kept out of the index.
+    """
+
+    def search(self, queryset, query):
+        """
+        Narrow ``queryset`` to products matching ``query``, best matches first.
+        """
+        raise NotImplementedError
+
+    def index(self, products):
+        pass
+
+    def remove(self, pks):
+        pass
+
+    def rebuild(self):
+        pass
+
+
+class LikeSearchBackend(ProductSearchBackend):
+    """
+    No index, the previous icontains behaviour. Used when no full-text backend fits the database.
+    """
+
+    fields = 'name', 'description'
+
+    def search(self, queryset, query):
+        terms = query.split()
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            queryset = queryset.filter(reduce(or_, (Q(**{f'{field}__icontains': term}) for field in self.fields)))
+        return queryset.filter(archived=False)
+
+
+class SQLiteFTS5Backend(ProductSearchBackend):
+    """
+    SQLite FTS5 table keyed by product rowid, ranked with bm25.
+
+    The table is created by migration 0012_product_fts and joined through
+    the unmanaged ProductSearchEntry model.
+    """
+
+    table = 'shopapp_product_fts'
+
+    @staticmethod
+    def match_expression(query):
+        # Quote every word so user input can't use FTS5 query syntax, and
+        # treat the last one as a prefix for search-as-you-type.
+        words = re.findall(r'\w+', query)
+        if not words:
+            return None
+        return ' '.join(f'"{word}"' for word in words) + '*'
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if match is None:
+            return queryset.none()
+        return (
+            queryset
+            .filter(search_entry__document__match=match)
+            .order_by('search_entry__rank')
+        )
+
+    def index(self, products):
+        rows = [(p.pk, p.name, p.description or '') for p in products if not p.archived]
+        self.remove([p.pk for p in products])
+        if rows:
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    f'INSERT INTO {self.table} (rowid, name, description) VALUES (%s, %s, %s)',
+                    rows,
+                )
+
+    def remove(self, pks):
+        pks = list(pks)
+        with connection.cursor() as cursor:
+            # Stay below SQLite's limit on query parameters.
+            for start in range(0, len(pks), 500):
+                chunk = pks[start:start + 500]
+                cursor.execute(
+                    f'DELETE FROM {self.table} WHERE rowid IN ({", ".join(["%s"] * len(chunk))})',
+                    chunk,
+                )
+
+    def rebuild(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, description) '
+                f'SELECT id, name, COALESCE(description, \'\') FROM {Product._meta.db_table} WHERE NOT archived'
+            )
+
+
+_backend = None
+
+
+def get_search_backend():
+    global _backend
+    if _backend is None:
+        default = SQLiteFTS5Backend if connection.vendor == 'sqlite' else LikeSearchBackend
+        backend_path = getattr(settings, 'SHOP_SEARCH_BACKEND', None)
+        _backend = (import_string(backend_path) if backend_path else default)()
+    return _backend
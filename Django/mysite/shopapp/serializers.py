@@ -1,5 +1,7 @@
+from collections import defaultdict
+
 from .models import Product, Order
-from rest_framework.serializers import ModelSerializer
+from rest_framework.serializers import BaseSerializer, DateTimeField, DecimalField, ListSerializer, ModelSerializer
 
 
 class ProductSerializer(ModelSerializer):
@@ -10,4 +12,54 @@ class ProductSerializer(ModelSerializer):
 class OrderSerializer(ModelSerializer):
     class Meta:
         model = Order
-        fields = 'pk', 'delivery_address', 'created_at', 'user', 'products'
\ No newline at end of file
+        fields = 'pk', 'delivery_address', 'created_at', 'user', 'products', 'total_amount', 'item_count'
+        read_only_fields = 'total_amount', 'item_count'
+
+
+class OrderReadListSerializer(ListSerializer):
+    """
+    Loads the product pks of the whole page with one values_list() query.
+    """
+
+    def to_representation(self, data):
+        orders = list(data)
+        products = defaultdict(list)
+        lines = (
+            Order.products.through.objects
+            .filter(order_id__in=[order.pk for order in orders])
+            .order_by('order_id', 'product_id')
+            .values_list('order_id', 'product_id')
+        )
+        for order_id, product_id in lines:
+            products[order_id].append(product_id)
+        for order in orders:
+            order.product_pks = products[order.pk]
+        return super().to_representation(orders)
+
+
+class OrderReadSerializer(BaseSerializer):
+    """
+    Read-only OrderSerializer output built by hand, without per-field
+    ModelSerializer machinery. Needs only the model fields in ``columns``.
+    """
+
+    columns = 'pk', 'delivery_address', 'created_at', 'user_id', 'total_amount', 'item_count'
+    created_at_field = DateTimeField()
+    total_amount_field = DecimalField(max_digits=12, decimal_places=2)
+
+    class Meta:
+        list_serializer_class = OrderReadListSerializer
+
+    def to_representation(self, instance):
+        product_pks = getattr(instance, 'product_pks', None)
+        if product_pks is None:
+            product_pks = list(instance.products.order_by('pk').values_list('pk', flat=True))
+        return {
+            'pk': instance.pk,
+            'delivery_address': instance.delivery_address,
+            'created_at': self.created_at_field.to_representation(instance.created_at),
+            'user': instance.user_id,
+            'products': product_pks,
+            'total_amount': self.total_amount_field.to_representation(instance.total_amount),
+            'item_count': instance.item_count,
+        }
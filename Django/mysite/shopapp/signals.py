@@ -0,0 +1,130 @@
+from django.db.models.signals import m2m_changed, post_delete, post_init, post_save, pre_delete
+from django.dispatch import receiver
+
+from .aggregates import recompute_order_aggregates, recompute_product_aggregates
+from .caching import bump_products_version, invalidate_products_last_modified, invalidate_user_orders
+from .models import Order, Product
+from .search import get_search_backend
+
+
+@receiver(post_init, sender=Order)
+def remember_order_user(sender, instance: Order, **kwargs):
+    # Read __dict__ so deferred fields are not loaded for every instance.
+    instance._loaded_user_id = instance.__dict__.get('user_id')
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+def invalidate_order_user(sender, instance: Order, **kwargs):
+    invalidate_user_orders({instance.user_id, instance._loaded_user_id} - {None})
+    instance._loaded_user_id = instance.user_id
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def invalidate_order_products(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_user_orders([instance.user_id])
+        return
+
+    # instance is a Product and pk_set holds order pks.
+    if action in ('post_add', 'post_remove'):
+        orders = Order.objects.filter(pk__in=pk_set)
+    elif action == 'pre_clear':
+        orders = instance.orders.all()
+    else:
+        return
+    invalidate_user_orders(orders.values_list('user_id', flat=True))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_dates(sender, instance: Product, **kwargs):
+    invalidate_products_last_modified()
+
+
+@receiver(post_init, sender=Product)
+def remember_product_archived(sender, instance: Product, **kwargs):
+    instance._loaded_archived = instance.__dict__.get('archived')
+
+
+@receiver(post_save, sender=Product)
+def bump_version_on_archive(sender, instance: Product, created, **kwargs):
+    archived = instance.__dict__.get('archived')
+    if not created and archived != instance._loaded_archived:
+        bump_products_version()
+    instance._loaded_archived = archived
+
+
+@receiver(post_delete, sender=Product)
+def bump_version_on_delete(sender, instance: Product, **kwargs):
+    bump_products_version()
+
+
+@receiver(pre_delete, sender=Product)
+def invalidate_product_orders(sender, instance: Product, **kwargs):
+    invalidate_user_orders(instance.orders.values_list('user_id', flat=True))
+
+
+@receiver(post_init, sender=Product)
+def remember_product_price(sender, instance: Product, **kwargs):
+    instance._loaded_price = instance.__dict__.get('price'), instance.__dict__.get('discount')
+
+
+@receiver(post_save, sender=Product)
+def update_totals_on_price_change(sender, instance: Product, created, **kwargs):
+    price = instance.price, instance.discount
+    if not created and price != instance._loaded_price:
+        recompute_order_aggregates(
+            Order.products.through.objects.filter(product_id=instance.pk).values('order_id')
+        )
+    instance._loaded_price = price
+
+
+@receiver(m2m_changed, sender=Order.products.through)
+def update_order_aggregates(sender, instance, action, reverse, pk_set, **kwargs):
+    related = instance.orders if reverse else instance.products
+    if action == 'pre_clear':
+        # pk_set is None for clear(), so remember what is being removed.
+        instance._cleared_pks = list(related.values_list('pk', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance._cleared_pks
+    elif action not in ('post_add', 'post_remove'):
+        return
+
+    order_ids, product_ids = (pk_set, [instance.pk]) if reverse else ([instance.pk], pk_set)
+    recompute_order_aggregates(order_ids)
+    recompute_product_aggregates(product_ids)
+
+
+# Deleting either side cascades to the through rows without m2m_changed.
+
+@receiver(pre_delete, sender=Product)
+def remember_product_orders(sender, instance: Product, **kwargs):
+    instance._order_pks = list(instance.orders.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Product)
+def update_totals_after_product_delete(sender, instance: Product, **kwargs):
+    recompute_order_aggregates(instance._order_pks)
+
+
+@receiver(pre_delete, sender=Order)
+def remember_order_products(sender, instance: Order, **kwargs):
+    instance._product_pks = list(instance.products.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Order)
+def update_counts_after_order_delete(sender, instance: Order, **kwargs):
+    recompute_product_aggregates(instance._product_pks)
+
+
+@receiver(post_save, sender=Product)
+def index_product(sender, instance: Product, **kwargs):
+    get_search_backend().index([instance])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance: Product, **kwargs):
+    get_search_backend().remove([instance.pk])
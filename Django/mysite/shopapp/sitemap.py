@@ -1,13 +1,29 @@
 from django.contrib.sitemaps import Sitemap
+from django.urls import reverse
 
+from .caching import products_last_modified
 from .models import Product
 
 class ShopSitemap(Sitemap):
     changefreq = 'never'
-    priotity = 0.5
+    priority = 0.5
+    # One sitemap file per 10k products, well under the protocol's 50k URLs.
+    limit = 10000
 
     def items(self):
-        return Product.objects.filter(archived__isnull=False).order_by('-creation_date')
+        # Ordered by pk so earlier sections stay stable as products are added.
+        return (
+            Product.objects
+            .filter(archived=False)
+            .order_by('pk')
+            .values_list('pk', 'modified_at')
+        )
 
-    def lastmod(self, obj: Product):
-        return obj.creation_date
\ No newline at end of file
+    def location(self, item):
+        return reverse('shopapp:products_details', kwargs={'pk': item[0]})
+
+    def lastmod(self, item):
+        return item[1]
+
+    def get_latest_lastmod(self):
+        return products_last_modified()
@@ -1,9 +1,40 @@
+import json
+from decimal import Decimal
+from io import StringIO
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import skipUnless
+from unittest import mock
+
+from django.conf import settings
 from django.contrib.auth.models import User, Permission
-from django.urls import reverse
-from django.test import TestCase
-from django.core.management import call_command
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import translation
+from django.http import HttpResponse
+from django.urls import resolve, reverse
+from django.test import RequestFactory, TestCase, override_settings
+from django.core.management import CommandError, call_command
 
+from mysite import fragment_cache
+from mysite.benchmarks import compare_reports, server_timing_queries
+from mysite.cache_backends import TieredCache
+from mysite.handlers import ASGI_URLCONF
+from mysite.pagination import KeysetPaginator, approximate_count
+from mysite.routers import STICKY_COOKIE, PrimaryReplicaRouter, ReplicaRoutingMiddleware
+from mysite.single_flight import get_or_recompute
+from mysite.testing import TEST_REPLICA_DATABASE, QueryBudgetMixin
+from shopapp.export import iter_orders
+from shopapp.caching import products_version, user_orders_cache_key
+from shopapp.sitemap import ShopSitemap
+from shopapp.importers import import_orders
 from shopapp.models import Order, Product
+from shopapp.serializers import OrderSerializer
+from shopapp.views import ProductsListView
 
 
 class OrderDetailViewTestCase(TestCase):
@@ -83,9 +114,1037 @@ class OrdersExportTestCase(TestCase):
             for order in orders
         ]
 
-        orders_data = response.json()
+        orders_data = json.loads(b''.join(response.streaming_content))
 
         print("\ntest_orders_data:", test_orders_data)
         print("orders_data:", orders_data['orders'])
 
-        self.assertEqual(orders_data['orders'], test_orders_data)
\ No newline at end of file
+        self.assertEqual(orders_data['orders'], test_orders_data)
+
+    def test_get_orders_ndjson(self):
+        response = self.client.get(reverse(viewname='shopapp:orders_json'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['pk'] for line in lines], list(Order.objects.order_by('pk').values_list('pk', flat=True)))
+
+    def test_unknown_format_is_not_echoed(self):
+        response = self.client.get(reverse(viewname='shopapp:orders_json'), {'format': '<script>'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response['Content-Type'], 'text/plain')
+        self.assertNotContains(response, '<script>', status_code=400)
+
+    def test_export_query_count_is_per_chunk(self):
+        chunks = Order.objects.count()
+        with self.assertNumQueries(2 * chunks + 1):
+            orders = list(iter_orders(chunk_size=1))
+        self.assertEqual(orders, list(iter_orders()))
+
+class ProductsListViewTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-products', password='test-password')
+        for i in range(25):
+            Product.objects.create(name=f'Product {i}', price=i, created_by=cls.user)
+        Product.objects.create(name='Archived', price=1, archived=True, created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_products_are_keyset_paginated(self):
+        url = reverse('shopapp:products')
+        expected = list(
+            Product.objects
+            .filter(archived=False)
+            .order_by('creation_date', 'pk')
+            .values_list('pk', flat=True)
+        )
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        first_page = response.context['page_obj']
+        self.assertEqual([p.pk for p in first_page], expected[:20])
+        self.assertFalse(first_page.has_previous())
+        self.assertNotContains(response, 'Archived')
+
+        response = self.client.get(url, {'cursor': first_page.next_cursor})
+        second_page = response.context['page_obj']
+        self.assertEqual([p.pk for p in second_page], expected[20:40])
+        self.assertTrue(second_page.has_previous())
+
+        response = self.client.get(url, {'cursor': second_page.previous_cursor})
+        self.assertEqual([p.pk for p in response.context['page_obj']], expected[:20])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('shopapp:products'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+
+class OrderImportTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-import', password='test-password')
+        cls.buyer = User.objects.create_user(username='test-user-buyer', password='test-password')
+        cls.products = [
+            Product.objects.create(name=f'Import {i}', price=10, created_by=cls.user)
+            for i in range(3)
+        ]
+
+    def test_import_orders_in_batches(self):
+        first, second, third = (product.pk for product in self.products)
+        rows = [
+            {'user': str(self.buyer.pk), 'delivery_address': 'ul Test, d 1', 'promo': '', 'products': f'{first},{second}'},
+            {'user': '', 'delivery_address': 'ul Test, d 2', 'promo': 'SALE', 'products': f'{third}'},
+            {'user': str(self.buyer.pk), 'delivery_address': '', 'promo': '', 'products': f'{first}'},
+            {'user': str(self.buyer.pk), 'delivery_address': 'ul Test, d 4', 'promo': '', 'products': '999999'},
+            {'user': str(self.buyer.pk), 'delivery_address': 'ul Test, d 5', 'promo': '', 'products': 'x'},
+        ]
+
+        # Users, products, savepoint, orders, order lines, order totals,
+        # product counts, savepoint release.
+        with self.assertNumQueries(8):
+            result = import_orders(rows, default_user=self.user)
+
+        self.assertEqual(result.rows, 5)
+        self.assertEqual(result.created, 2)
+        self.assertEqual([line for line, _ in result.errors], [4, 5, 6])
+
+        imported = Order.objects.filter(delivery_address__startswith='ul Test').order_by('pk')
+        self.assertEqual(
+            [(order.user_id, sorted(order.products.values_list('pk', flat=True))) for order in imported],
+            [(self.buyer.pk, [first, second]), (self.user.pk, [third])],
+        )
+        self.assertEqual([order.item_count for order in imported], [2, 1])
+
+
+
+class UserOrdersExportTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-export', password='test-password')
+        cls.product = Product.objects.create(name='Export', price=10, created_by=cls.user)
+        cls.other_product = Product.objects.create(name='Export 2', price=10, created_by=cls.user)
+        cls.order = Order.objects.create(user=cls.user, delivery_address='ul Test, d 1')
+        cls.order.products.set([cls.product])
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+        self.url = reverse('shopapp:users_orders_export', kwargs={'user_id': self.user.pk})
+
+    def test_repeat_request_is_not_modified_without_order_queries(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['orders'][0]['products'], [self.product.pk])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertFalse([query for query in queries if 'shopapp_order' in query['sql']])
+
+    def test_order_changes_invalidate_cached_payload(self):
+        etag = self.client.get(self.url)['ETag']
+
+        self.order.products.add(self.other_product)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['orders'][0]['products'], [self.product.pk, self.other_product.pk])
+
+        self.other_product.orders.remove(self.order)
+        self.assertEqual(self.client.get(self.url).json()['orders'][0]['products'], [self.product.pk])
+
+        self.order.delivery_address = 'ul Test, d 2'
+        self.order.save()
+        self.assertEqual(self.client.get(self.url).json()['orders'][0]['delivery_address'], 'ul Test, d 2')
+
+    def test_stale_payload_is_served_while_another_worker_rebuilds(self):
+        etag = self.client.get(self.url)['ETag']
+        key = user_orders_cache_key(self.user.pk)
+        _, elapsed, value = cache.get(key)
+        cache.set(key, (time.time() - 1, elapsed, value))
+        cache.add(f'{key}:lock', True)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response['ETag'], etag)
+        self.assertFalse([query for query in queries if 'shopapp_order' in query['sql']])
+
+
+class ProductsConditionalGetTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-conditional', password='test-password')
+        cls.product = Product.objects.create(name='Conditional', price=10, description='desc', created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_product_details_not_modified(self):
+        url = reverse('shopapp:products_details', kwargs={'pk': self.product.pk})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+        self.product.price = 20
+        self.product.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+
+    def test_sitemap_and_feed_not_modified(self):
+        for url in (reverse('sitemaps'), reverse('shopapp:feed')):
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+
+            with self.assertNumQueries(0):
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, 304)
+
+        # An evicted products version restarts at the current time.
+        time.sleep(1)
+        cache.clear()
+        response = self.client.get(reverse('sitemaps'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('sitemaps'), HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_feed_changes_when_an_older_product_is_deleted_or_archived(self):
+        url = reverse('shopapp:feed')
+        Product.objects.create(name='Newer', price=1, created_by=self.user)
+        for change in ('archive', 'delete'):
+            with self.subTest(change=change):
+                last_modified = self.client.get(url)['Last-Modified']
+                time.sleep(1)
+                product = Product.objects.get(pk=self.product.pk)
+                if change == 'archive':
+                    Product.objects.filter(pk=product.pk).update(archived=True)
+                    product.archived = True
+                    product.save(update_fields=['archived'])
+                else:
+                    product.delete()
+                response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'Conditional')
+
+
+
+class SitemapTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-sitemap', password='test-password')
+        cls.products = [
+            Product.objects.create(name=f'Sitemap {i}', price=1, created_by=cls.user)
+            for i in range(3)
+        ]
+        cls.archived = Product.objects.create(name='Archived', price=1, archived=True, created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        # Start the version before the test files are written, as render_sitemaps does.
+        products_version()
+
+    def sitemap_root(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return Path(directory.name)
+
+    def test_sections_are_paginated_and_skip_archived(self):
+        with self.settings(SITEMAP_ROOT=self.sitemap_root()), mock.patch.object(ShopSitemap, 'limit', 2):
+            index = self.client.get(reverse('sitemaps')).content.decode()
+            pages = Product.objects.filter(archived=False).count() // 2 + 1
+            content = ''.join(
+                self.client.get(reverse('sitemap_section', kwargs={'section': 'shop'}), {'p': page}).content.decode()
+                for page in range(1, pages + 1)
+            )
+
+        self.assertIn('/sitemap-shop.xml?p=2', index)
+        for product in self.products:
+            self.assertIn(product.get_absolute_url(), content)
+        self.assertNotIn(self.archived.get_absolute_url(), content)
+
+    def test_prerendered_file_is_served_until_products_change(self):
+        root = self.sitemap_root()
+        (root / 'sitemap.xml').write_bytes(b'<prerendered/>')
+        with override_settings(SITEMAP_ROOT=root):
+            self.assertEqual(self.client.get(reverse('sitemaps')).content, b'<prerendered/>')
+
+            Product.objects.create(name='New', price=1, created_by=self.user)
+            self.assertNotEqual(self.client.get(reverse('sitemaps')).content, b'<prerendered/>')
+
+    def test_deleting_an_older_product_changes_the_sitemap(self):
+        root = self.sitemap_root()
+        (root / 'sitemap-shop-1.xml').write_bytes(b'<prerendered/>')
+        url = reverse('sitemap_section', kwargs={'section': 'shop'})
+        with override_settings(SITEMAP_ROOT=root):
+            response = self.client.get(url)
+            self.assertEqual(response.content, b'<prerendered/>')
+            headers = {
+                'HTTP_IF_MODIFIED_SINCE': response['Last-Modified'],
+                'HTTP_IF_NONE_MATCH': response['ETag'],
+            }
+            self.assertEqual(self.client.get(url, **headers).status_code, 304)
+
+            # Not the latest product, so MAX(modified_at) stays the same.
+            time.sleep(0.01)
+            deleted = Product.objects.get(pk=self.products[0].pk)
+            deleted_url = deleted.get_absolute_url()
+            deleted.delete()
+            response = self.client.get(url, **headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.content, b'<prerendered/>')
+            self.assertNotContains(response, deleted_url)
+
+    def test_sitemap_is_rendered_per_language(self):
+        url = reverse('sitemap_section', kwargs={'section': 'shop'})
+        with override_settings(SITEMAP_ROOT=self.sitemap_root()):
+            english = self.client.get(url)
+            russian = self.client.get(url, HTTP_ACCEPT_LANGUAGE='ru')
+        self.assertContains(english, '/en/shop/products/')
+        self.assertContains(russian, '/ru/shop/products/')
+        self.assertNotContains(russian, '/en/shop/products/')
+        self.assertNotEqual(english['ETag'], russian['ETag'])
+
+
+class HotQueriesTestCase(TestCase):
+
+    def test_hot_queries_use_indexes(self):
+        call_command('explain_hot_queries', stdout=StringIO())
+
+
+
+class OrderAggregatesTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-aggregates', password='test-password')
+        cls.apple = Product.objects.create(name='Apple', price=10, discount=10, created_by=cls.user)
+        cls.pear = Product.objects.create(name='Pear', price='2.50', created_by=cls.user)
+
+    def assertAggregates(self, order, total, item_count):
+        order.refresh_from_db()
+        self.assertEqual((order.total_amount, order.item_count), (Decimal(total), item_count))
+
+    def test_aggregates_follow_order_and_product_changes(self):
+        order = Order.objects.create(user=self.user, delivery_address='ul Test, d 1')
+        order.products.add(self.apple, self.pear)
+        self.assertAggregates(order, '11.50', 2)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.orders_count, 1)
+
+        self.apple.discount = 0
+        self.apple.save()
+        self.assertAggregates(order, '12.50', 2)
+
+        self.pear.orders.remove(order)
+        self.assertAggregates(order, '10.00', 1)
+
+        order.products.clear()
+        self.assertAggregates(order, '0.00', 0)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.orders_count, 0)
+
+    def test_recompute_command(self):
+        order = Order.objects.create(user=self.user, delivery_address='ul Test, d 1')
+        order.products.add(self.apple)
+        Order.objects.update(total_amount=0, item_count=0)
+        Product.objects.update(orders_count=0)
+
+        call_command('recompute_aggregates', batch_size=1, stdout=StringIO())
+
+        self.assertAggregates(order, '9.00', 1)
+        self.apple.refresh_from_db()
+        self.assertEqual(self.apple.orders_count, 1)
+
+    def test_discount_that_does_not_divide_evenly(self):
+        plum = Product.objects.create(name='Plum', price=10, discount=5, created_by=self.user)
+        order = Order.objects.create(user=self.user, delivery_address='ul Test, d 1')
+        order.products.add(plum, self.pear)
+        self.assertAggregates(order, '12.00', 2)
+
+        plum.price = Decimal('3.33')
+        plum.discount = 33
+        plum.save()
+        self.assertAggregates(order, '4.73', 2)
+
+
+class ProductSearchTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-search', password='test-password')
+        cls.mango = Product.objects.create(name='Mango', description='sweet yellow fruit', created_by=cls.user)
+        cls.banana = Product.objects.create(name='Banana', description='yellow, mango sized', created_by=cls.user)
+        cls.lemon = Product.objects.create(name='Lemon', description='sour yellow citrus', created_by=cls.user)
+
+    def search(self, query):
+        response = self.client.get(reverse('shopapp:product-list'), {'search': query})
+        self.assertEqual(response.status_code, 200)
+        return [product['pk'] for product in response.json()['results']]
+
+    def test_search_is_ranked_and_follows_changes(self):
+        self.assertEqual(self.search('mango'), [self.mango.pk, self.banana.pk])
+        self.assertEqual(self.search('cit'), [self.lemon.pk])
+        self.assertEqual(self.search('"'), [])
+
+        self.lemon.name = 'Lime'
+        self.lemon.save()
+        self.assertEqual(self.search('lime'), [self.lemon.pk])
+
+        self.banana.archived = True
+        self.banana.save()
+        self.assertEqual(self.search('mango'), [self.mango.pk])
+
+        self.mango.delete()
+        self.assertEqual(self.search('mango'), [])
+
+
+class RequestMetricsTestCase(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-metrics', password='test-password')
+        for i in range(30):
+            Product.objects.create(name=f'Metrics {i}', price=i, created_by=cls.user)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_views_stay_within_query_budget(self):
+        product = Product.objects.first()
+        urls = [
+            reverse('shopapp:products'),
+            reverse('shopapp:products_details', kwargs={'pk': product.pk}),
+            reverse('shopapp:product-list'),
+            reverse('shopapp:users_orders_export', kwargs={'user_id': self.user.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertIn('db;dur=', response['Server-Timing'])
+                self.assertWithinQueryBudget(response)
+
+    def test_metrics_leave_no_wrappers_behind(self):
+        with self.assertLogs('mysite.middleware', 'DEBUG') as logs:
+            response = self.client.get(reverse('shopapp:product-list'))
+        self.assertGreater(response.request_metrics['queries'], 0)
+        self.assertEqual(connection.execute_wrappers, [])
+        self.assertEqual([record.levelname for record in logs.records], ['DEBUG'])
+
+    def test_async_views_are_only_routed_under_asgi(self):
+        url = reverse('shopapp:products')
+        self.assertFalse(resolve(url).func.view_class.view_is_async)
+        self.assertTrue(resolve(url, urlconf=ASGI_URLCONF).func.view_class.view_is_async)
+
+    @override_settings(ROOT_URLCONF=ASGI_URLCONF)
+    async def test_async_views_under_asgi(self):
+        product = await Product.objects.afirst()
+        export_url = reverse('shopapp:users_orders_export', kwargs={'user_id': self.user.pk})
+        response = await self.async_client.get(export_url)
+        self.assertRedirects(response, f'{reverse("myauth:login")}?next={export_url}', fetch_redirect_response=False)
+
+        await self.async_client.aforce_login(self.user)
+        urls = [
+            reverse('shopapp:products'),
+            reverse('shopapp:products_details', kwargs={'pk': product.pk}),
+            reverse('shopapp:feed'),
+            reverse('shopapp:users_orders_export', kwargs={'user_id': self.user.pk}),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = await self.async_client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(response.request_metrics['queries'], 0)
+                self.assertWithinQueryBudget(response)
+
+
+class OrdersListViewTestCase(QueryBudgetMixin, TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-orders', password='test-password', first_name='tester')
+        cls.products = [
+            Product.objects.create(name=f'Orders {i}', price=1, created_by=cls.user)
+            for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def create_orders(self, count):
+        for i in range(count):
+            order = Order.objects.create(user=self.user, delivery_address=f'ul Test, d {i}')
+            order.products.set(self.products)
+
+    def get_orders(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shopapp:orders'))
+        self.assertEqual(response.status_code, 200)
+        self.assertWithinQueryBudget(response)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.create_orders(1)
+        _, few_orders_queries = self.get_orders()
+
+        self.create_orders(40)
+        response, many_orders_queries = self.get_orders()
+
+        self.assertEqual(few_orders_queries, many_orders_queries)
+        self.assertEqual(len(response.context['orders']), 20)
+        self.assertContains(response, 'Tester')
+        self.assertContains(response, 'Orders 2')
+
+
+class FragmentCacheTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-fragments', password='test-password')
+        cls.product = Product.objects.create(name='Fragment product', price=1, created_by=cls.user)
+        cls.order = Order.objects.create(user=cls.user, delivery_address='ul Fragment, d 1')
+        cls.order.products.add(cls.product)
+
+    def setUp(self):
+        cache.clear()
+
+    def counts(self, model):
+        label = model._meta.label_lower
+        return fragment_cache.stats[f'{label}:hit'], fragment_cache.stats[f'{label}:miss']
+
+    def test_rows_are_served_from_cache_until_saved(self):
+        # Open the page that starts at the test product.
+        queryset = ProductsListView().get_queryset().order_by(*ProductsListView.ordering)
+        previous = queryset.filter(creation_date__lt=self.product.creation_date).last()
+        params = {}
+        if previous is not None:
+            paginator = KeysetPaginator(queryset, ProductsListView.ordering, ProductsListView.paginate_by)
+            params['cursor'] = paginator.encode_cursor(previous)
+        url = reverse('shopapp:products')
+
+        rows = len(self.client.get(url, params).context['page_obj'].object_list)
+        hits, misses = self.counts(Product)
+
+        response = self.client.get(url, params)
+        self.assertContains(response, 'Fragment product')
+        self.assertEqual(self.counts(Product), (hits + rows, misses))
+
+        self.product.name = 'Renamed product'
+        self.product.save()
+        response = self.client.get(url, params)
+        self.assertContains(response, 'Renamed product')
+        self.assertEqual(self.counts(Product), (hits + 2 * rows - 1, misses + 1))
+
+    def test_order_rows_follow_product_names_and_lines(self):
+        url = reverse('shopapp:orders')
+        self.client.get(url)
+
+        self.product.name = 'Renamed in orders'
+        self.product.save()
+        self.assertContains(self.client.get(url), 'Renamed in orders')
+
+        other = Product.objects.create(name='Added line', price=1, created_by=self.user)
+        self.order.products.add(other)
+        self.assertContains(self.client.get(url), 'Added line')
+
+    def test_order_rows_survive_unrelated_product_saves(self):
+        url = reverse('shopapp:orders')
+        self.client.get(url)
+        hits, misses = self.counts(Order)
+
+        product = Product.objects.get(pk=self.product.pk)
+        product.price = 2
+        product.save()
+        self.client.get(url)
+        self.assertEqual(self.counts(Order)[1], misses)
+        self.assertGreater(self.counts(Order)[0], hits)
+
+    def test_rows_are_cached_per_language(self):
+        url = reverse('shopapp:products')
+        self.client.get(url)
+        with translation.override('ru'):
+            url = reverse('shopapp:products')
+        response = self.client.get(url)
+        self.assertContains(response, f'href="{url}/', html=False)
+        self.assertNotContains(response, '/en/shop/')
+
+    def test_login_does_not_invalidate_order_rows(self):
+        url = reverse('shopapp:orders')
+        self.client.get(url)
+        hits, misses = self.counts(Order)
+
+        self.client.login(username='test-user-fragments', password='test-password')
+        self.client.get(url)
+        self.assertEqual(self.counts(Order)[1], misses)
+
+
+class TieredCacheTestCase(TestCase):
+
+    def setUp(self):
+        self.location = tempfile.TemporaryDirectory()
+        self.addCleanup(self.location.cleanup)
+
+    def make_cache(self, **options):
+        return TieredCache(self.location.name, {'OPTIONS': options})
+
+    def test_tests_do_not_use_the_real_cache_dir(self):
+        self.assertNotEqual(Path(settings.CACHES['default']['LOCATION']), settings.DATABASEE_DIR / 'cache')
+        self.assertTrue(Path(settings.CACHES['default']['LOCATION']).is_relative_to(tempfile.gettempdir()))
+
+    def test_workers_share_l2(self):
+        first, second = self.make_cache(), self.make_cache()
+        first.set('user_orders:1', {'etag': 'x'}, 60)
+
+        self.assertEqual(second.get('user_orders:1'), {'etag': 'x'})
+        self.assertEqual(second.get('user_orders:1'), {'etag': 'x'})
+        self.assertEqual(second.stats[('user_orders', 'l2_hit')], 1)
+        self.assertEqual(second.stats[('user_orders', 'l1_hit')], 1)
+
+        first.delete('user_orders:1')
+        self.assertIsNone(first.get('user_orders:1'))
+
+    def test_l1_copies_expire(self):
+        first, second = self.make_cache(L1_TIMEOUT=0), self.make_cache(L1_TIMEOUT=0)
+        first.set('key', 1)
+        second.get('key')
+        first.set('key', 2)
+        self.assertEqual(second.get('key'), 2)
+
+    def test_l1_evicts_least_recently_used_by_size(self):
+        cache = self.make_cache(L1_MAX_BYTES=300)
+        cache.set('a', 'x' * 100)
+        cache.set('b', 'x' * 100)
+        cache.get('a')
+        cache.set('c', 'x' * 100)
+
+        self.assertLessEqual(cache.l1.size, 300)
+        self.assertIsNotNone(cache.l1.get(cache.make_key('a')))
+        self.assertIsNone(cache.l1.get(cache.make_key('b')))
+        # Evicted from L1 only.
+        self.assertEqual(cache.get('b'), 'x' * 100)
+
+    def test_timeouts_are_jittered_down(self):
+        cache = self.make_cache(JITTER=0.5)
+        timeouts = {round(cache.jittered(100)) for _ in range(50)}
+        self.assertTrue(all(50 <= timeout <= 100 for timeout in timeouts))
+        self.assertGreater(len(timeouts), 1)
+        self.assertIsNone(cache.jittered(None))
+
+    def test_stats_are_collected_per_process(self):
+        cache = self.make_cache()
+        cache.set('fragment:1', 'row')
+        cache.get('fragment:1')
+        cache.get('fragment:2')
+        cache.flush_stats()
+
+        out = StringIO()
+        with override_settings(CACHES={'default': {
+            'BACKEND': 'mysite.cache_backends.TieredCache',
+            'LOCATION': self.location.name,
+        }}):
+            call_command('cache_stats', stdout=out)
+        self.assertIn('Processes: 1', out.getvalue())
+        self.assertRegex(out.getvalue(), r'fragment\s+1\s+0\s+1\s+1\s+50.0%')
+
+
+class SingleFlightTestCase(TestCase):
+
+    def setUp(self):
+        location = tempfile.TemporaryDirectory()
+        self.addCleanup(location.cleanup)
+        self.cache = TieredCache(location.name, {'OPTIONS': {'JITTER': 0}})
+        self.computes = 0
+        self.lock = threading.Lock()
+
+    def compute(self):
+        with self.lock:
+            self.computes += 1
+        # Stands in for the orders query and serialization.
+        time.sleep(0.2)
+        return self.computes
+
+    def run_concurrently(self, workers=20):
+        barrier = threading.Barrier(workers)
+        results = []
+
+        def worker():
+            barrier.wait()
+            results.append(get_or_recompute('key', self.compute, 60, beta=0, cache=self.cache))
+
+        threads = [threading.Thread(target=worker) for _ in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_cold_key_is_computed_once(self):
+        results = self.run_concurrently()
+        self.assertEqual(self.computes, 1)
+        self.assertEqual(results, [1] * 20)
+
+    def test_expired_key_is_recomputed_once_and_stale_value_served(self):
+        self.cache.set('key', (time.time() - 1, 0.2, 'stale'), 120)
+        results = self.run_concurrently()
+        self.assertEqual(self.computes, 1)
+        self.assertEqual(sorted(set(results), key=str), [1, 'stale'])
+        self.assertEqual(results.count(1), 1)
+        self.assertEqual(get_or_recompute('key', self.compute, 60, beta=0, cache=self.cache), 1)
+
+    def test_fresh_value_is_not_recomputed(self):
+        get_or_recompute('key', self.compute, 60, beta=0, cache=self.cache)
+        self.assertEqual(self.run_concurrently(), [1] * 20)
+        self.assertEqual(self.computes, 1)
+
+
+class SQLiteSettingsTestCase(TestCase):
+
+    def test_pragmas_are_applied_on_connect(self):
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['busy_timeout'])
+            cursor.execute('PRAGMA cache_size')
+            self.assertEqual(cursor.fetchone()[0], settings.SQLITE_PRAGMAS['cache_size'])
+
+
+@skipUnless(TEST_REPLICA_DATABASE in settings.DATABASES, 'Needs the test replica of mysite.testing.TestRunner')
+@override_settings(REPLICA_DATABASE=TEST_REPLICA_DATABASE)
+class ReplicaRoutingTestCase(TestCase):
+    databases = {'default', TEST_REPLICA_DATABASE}
+
+    def route(self, method, url, cookies=None):
+        """
+        Pass a request through ReplicaRoutingMiddleware and return the
+        alias Product reads would use inside the view.
+        """
+        request = getattr(RequestFactory(), method)(url)
+        request.COOKIES.update(cookies or {})
+        request.resolver_match = resolve(url)
+        seen = []
+
+        def view(request):
+            middleware.process_view(request, None, (), {})
+            seen.append(router.db_for_read(Product) or 'default')
+            return HttpResponse()
+
+        router = PrimaryReplicaRouter()
+        middleware = ReplicaRoutingMiddleware(view)
+        response = middleware(request)
+        self.assertIsNone(router.db_for_read(Product))
+        return seen[0], response
+
+    def test_read_only_views_use_replica(self):
+        self.assertEqual(self.route('get', reverse('shopapp:products'))[0], 'replica')
+        self.assertEqual(self.route('get', reverse('shopapp:product-list'))[0], 'replica')
+        self.assertEqual(self.route('get', reverse('sitemaps'))[0], 'replica')
+        self.assertEqual(self.route('get', reverse('shopapp:orders'))[0], 'default')
+        self.assertEqual(PrimaryReplicaRouter().db_for_write(Product), 'default')
+
+    def test_post_sticks_client_to_primary(self):
+        alias, response = self.route('post', reverse('shopapp:product-list'))
+        self.assertEqual(alias, 'default')
+        cookie = response.cookies[STICKY_COOKIE]
+        self.assertEqual(cookie['max-age'], settings.REPLICA_STICKY_SECONDS)
+
+        alias, _ = self.route('get', reverse('shopapp:products'), {STICKY_COOKIE: cookie.value})
+        self.assertEqual(alias, 'default')
+
+    def test_reads_go_to_the_replica_connection(self):
+        user = User.objects.create_user(username='test-user-replica')
+        # bulk_create skips the profile signal, which would write to the primary.
+        User.objects.using(TEST_REPLICA_DATABASE).bulk_create([User(pk=user.pk, username=user.username)])
+        Product.objects.using(TEST_REPLICA_DATABASE).create(name='Replica only', price=1, created_by_id=user.pk)
+        Product.objects.create(name='Primary only', price=1, created_by=user)
+
+        # The API is not fragment cached, so both rows can share a pk.
+        response = self.client.get(reverse('shopapp:product-list'))
+        self.assertContains(response, 'Replica only')
+        self.assertNotContains(response, 'Primary only')
+
+        # The sticky cookie set by a write keeps the next read on the primary.
+        self.client.cookies[STICKY_COOKIE] = '1'
+        response = self.client.get(reverse('shopapp:product-list'))
+        self.assertContains(response, 'Primary only')
+        self.assertNotContains(response, 'Replica only')
+
+    def test_replica_is_never_migrated(self):
+        router = PrimaryReplicaRouter()
+        self.assertIs(router.allow_migrate('replica', 'shopapp'), False)
+        self.assertIsNone(router.allow_migrate('default', 'shopapp'))
+
+
+class OrdersApiTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-orders-api', password='test-password')
+        cls.products = [
+            Product.objects.create(name=f'Api {i}', price=i + 1, created_by=cls.user)
+            for i in range(3)
+        ]
+
+    def create_orders(self, count):
+        for i in range(count):
+            order = Order.objects.create(user=self.user, delivery_address=f'ul Api, d {i}')
+            order.products.set(self.products[:i % 3 + 1])
+
+    def get_orders(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('shopapp:order-list'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(queries)
+
+    def test_query_count_does_not_grow_with_orders(self):
+        self.create_orders(1)
+        _, few_orders_queries = self.get_orders()
+
+        self.create_orders(30)
+        data, many_orders_queries = self.get_orders()
+
+        self.assertEqual(few_orders_queries, many_orders_queries)
+        self.assertEqual(len(data['results']), 10)
+
+    def test_read_serializer_matches_model_serializer(self):
+        self.create_orders(3)
+        data, _ = self.get_orders(user=self.user.pk, ordering='pk', count='approximate')
+        orders = Order.objects.filter(user=self.user).order_by('pk')
+        self.assertEqual((data['count'], data['count_is_exact']), (3, True))
+        self.assertEqual(data['results'], json.loads(json.dumps(OrderSerializer(orders, many=True).data)))
+
+        data, _ = self.get_orders(products=self.products[2].pk, user=self.user.pk)
+        self.assertEqual([order['pk'] for order in data['results']], [orders[2].pk])
+
+
+class ApiPaginationTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.user = User.objects.create_user(username='test-user-api-pages', password='test-password')
+        for i in range(25):
+            Product.objects.create(name=f'Page {i}', price=i % 4, archived=i % 5 == 0, created_by=cls.user)
+
+    def walk(self, url, params=None):
+        pks = []
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+            while True:
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                pks.extend(product['pk'] for product in data['results'])
+                if not data['next']:
+                    break
+                response = self.client.get(data['next'])
+        self.assertFalse([query for query in queries if 'COUNT(' in query['sql'].upper()])
+        return pks
+
+    def test_pages_follow_creation_order_without_count(self):
+        url = reverse('shopapp:product-list')
+        expected = list(Product.objects.order_by('-creation_date', '-pk').values_list('pk', flat=True))
+        self.assertEqual(self.walk(url), expected)
+
+        expected = list(Product.objects.order_by('price', 'pk').values_list('pk', flat=True))
+        self.assertEqual(self.walk(url, {'ordering': 'price'}), expected)
+
+        response = self.client.get(url, {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_previous_link_returns_to_the_same_page(self):
+        url = reverse('shopapp:product-list')
+        first = self.client.get(url).json()
+        second = self.client.get(first['next']).json()
+        self.assertEqual(self.client.get(second['previous']).json()['results'], first['results'])
+
+    def test_approximate_count(self):
+        data = self.client.get(reverse('shopapp:product-list'), {'count': 'approximate'}).json()
+        self.assertEqual((data['count'], data['count_is_exact']), (Product.objects.count(), True))
+
+        archived = Product.objects.filter(archived=True)
+        self.assertEqual(approximate_count(archived), (archived.count(), True))
+        self.assertEqual(approximate_count(archived, cap=2), (2, False))
+
+    @skipUnless(connection.vendor == 'sqlite', 'Reads sqlite_stat1')
+    def test_table_estimate_is_not_a_partial_index_count(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        products = Product.objects.all()
+        self.assertEqual(approximate_count(products, cap=1), (products.count(), False))
+
+
+class GenerateLoadDataTestCase(TestCase):
+
+    def test_generates_consistent_rows(self):
+        out = StringIO()
+        call_command(
+            'generate_load_data', seed=7, users=20, products=30, orders=200, articles=10, tags=5,
+            categories=2, batch_size=50, stdout=out,
+        )
+        self.assertIn('orders', out.getvalue())
+
+        users = User.objects.filter(username__startswith='load-7-')
+        self.assertEqual(users.count(), 20)
+        self.assertFalse(users.filter(profile__isnull=True).exists())
+        self.assertTrue(users.first().check_password('load-data'))
+
+        orders = Order.objects.filter(user__in=users)
+        self.assertEqual(orders.count(), 200)
+        for order in orders.annotate(lines=Count('products'))[:20]:
+            self.assertEqual(order.item_count, order.lines)
+
+        # Zipf: the most popular product is in many more orders than the median one.
+        counts = sorted(Product.objects.filter(created_by__in=users).values_list('orders_count', flat=True))
+        self.assertGreater(counts[-1], 3 * counts[len(counts) // 2])
+
+        with self.assertRaises(CommandError):
+            call_command('generate_load_data', seed=7, users=1, products=0, orders=0, articles=0, stdout=out)
+
+
+class BenchmarkRoutesTestCase(TestCase):
+
+    def test_report_and_baseline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            report_path = Path(directory) / 'report.json'
+            call_command(
+                'benchmark_routes', anonymous=True, routes='shopapp:shop_index', requests=3, warmup=0,
+                concurrency=1, output=str(report_path), stdout=StringIO(),
+            )
+            report = json.loads(report_path.read_text())
+        result = report['routes']['shopapp:shop_index']
+        self.assertEqual((result['status'], result['count'], result['errors']), (200, 3, 0))
+        self.assertEqual(result['queries'], 0)
+
+        self.assertEqual(compare_reports(report, report, 0.2), [])
+        slower = json.loads(json.dumps(report))
+        slower['routes']['shopapp:shop_index'].update(p95_ms=result['p95_ms'] * 2 + 1, queries=3)
+        self.assertEqual(
+            [(route, metric) for route, metric, _, _ in compare_reports(report, slower, 0.2)],
+            [('shopapp:shop_index', 'p95_ms'), ('shopapp:shop_index', 'queries')],
+        )
+
+    def test_server_timing_queries(self):
+        self.assertEqual(server_timing_queries('db;dur=1.5;desc="4 queries", total;dur=9'), 4)
+        self.assertIsNone(server_timing_queries(None))
+
+
+class AdminChangelistTestCase(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+
+        cls.admin = User.objects.create_superuser(username='test-user-admin', password='test-password')
+        cls.product = Product.objects.create(
+            name='Admin product', price=1, description='word ' * 1000, created_by=cls.admin,
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def create_rows(self, count):
+        for i in range(count):
+            order = Order.objects.create(user=self.admin, delivery_address=f'ul Admin, d {i}')
+            order.products.add(self.product)
+            Product.objects.create(name=f'Admin {i}', price=1, created_by=self.admin)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [
+            reverse('admin:shopapp_product_changelist'),
+            reverse('admin:shopapp_order_changelist'),
+            reverse('admin:shopapp_product_change', args=[self.product.pk]),
+        ]
+        self.create_rows(1)
+        order = Order.objects.filter(products=self.product).first()
+        urls.append(reverse('admin:shopapp_order_change', args=[order.pk]))
+        # The first requests fill the content type cache.
+        for url in urls:
+            self.get(url)
+        few_rows = [self.get(url)[1] for url in urls]
+        self.create_rows(30)
+        many_rows = [self.get(url)[1] for url in urls]
+        self.assertEqual(few_rows, many_rows)
+
+    def test_product_page_links_to_its_orders(self):
+        self.create_rows(3)
+        response, _ = self.get(reverse('admin:shopapp_product_change', args=[self.product.pk]))
+        self.assertNotContains(response, 'ul Admin')
+        url = f'{reverse("admin:shopapp_order_changelist")}?products__id__exact={self.product.pk}'
+        self.assertContains(response, f'<a href="{url}">')
+
+        response, _ = self.get(reverse('admin:shopapp_order_changelist'), products__id__exact=self.product.pk)
+        self.assertEqual(
+            {order.pk for order in response.context['cl'].result_list},
+            set(self.product.orders.values_list('pk', flat=True)),
+        )
+
+    def test_description_preview_and_pk_search(self):
+        url = reverse('admin:shopapp_product_changelist')
+        response, _ = self.get(url)
+        self.assertContains(response, 'word ' * 9 + 'word…')
+        self.assertNotContains(response, 'word ' * 11)
+
+        response, _ = self.get(url, q=str(self.product.pk))
+        self.assertEqual(list(response.context['cl'].result_list), [self.product])
+
+        for term in ('²', '99999999999999999999'):
+            with self.subTest(term=term):
+                response, _ = self.get(url, q=term)
+                self.assertFalse(response.context['cl'].result_list)
+
+    def test_inline_lines_update_aggregates(self):
+        order = Order.objects.create(user=self.admin, delivery_address='ul Admin, d 1')
+        prefix = 'Order_products-'
+        with mock.patch('shopapp.admin.invalidate_user_orders') as invalidate:
+            response = self.client.post(reverse('admin:shopapp_order_change', args=[order.pk]), {
+                'user': self.admin.pk,
+                'delivery_address': order.delivery_address,
+                'promo': '',
+                f'{prefix}TOTAL_FORMS': 1,
+                f'{prefix}INITIAL_FORMS': 0,
+                f'{prefix}0-product': self.product.pk,
+            })
+        self.assertEqual(response.status_code, 302)
+        invalidate.assert_called_once_with([self.admin.pk])
+        order.refresh_from_db()
+        self.product.refresh_from_db()
+        self.assertEqual(order.item_count, 1)
+        self.assertEqual(self.product.orders_count, Order.objects.filter(products=self.product).count())
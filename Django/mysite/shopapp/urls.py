@@ -8,7 +8,7 @@ from .views import (shop_index,
                     OrdersDetailView, OrderCreateView,
                     OrderUpdateView, OrderDeleteView,
                     OrdersExportView, ProductListViewWithSerializer,
-                    OrderListViewWithSerializer, LatestProductsFeed,
+                    OrderListViewWithSerializer, latest_products_feed,
                     UserOrdersListView, UserOrdersExportView)
 
 app_name = 'shopapp'
@@ -35,5 +35,5 @@ urlpatterns = [
     path('orders/user/<int:user_id>/export', UserOrdersExportView.as_view(), name='users_orders_export'),
 
     path('api/', include(routers.urls)),
-    path('latest/feed/', LatestProductsFeed(), name='feed'),
+    path('latest/feed/', latest_products_feed, name='feed'),
 ]
@@ -0,0 +1,15 @@
+from django.urls import path
+
+from . import urls
+from .views import (AsyncProductsListView, AsyncProductsDetailView,
+                    AsyncUserOrdersExportView, async_latest_products_feed)
+
+app_name = urls.app_name
+
+# Async versions of some shop views, on the same routes, for mysite.asgi.
+urlpatterns = [
+    path('products', AsyncProductsListView.as_view(), name='products'),
+    path('products/<int:pk>/', AsyncProductsDetailView.as_view(), name='products_details'),
+    path('orders/user/<int:user_id>/export', AsyncUserOrdersExportView.as_view(), name='users_orders_export'),
+    path('latest/feed/', async_latest_products_feed, name='feed'),
+] + urls.urlpatterns
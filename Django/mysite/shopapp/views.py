@@ -1,19 +1,38 @@
-from django.http import HttpRequest, HttpResponseRedirect, JsonResponse
+import hashlib
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import (HttpRequest, HttpResponse, HttpResponseRedirect, Http404,
+                         HttpResponseBadRequest, StreamingHttpResponse)
 from django.shortcuts import render, reverse, get_object_or_404
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.decorators import method_decorator
+from django.utils.http import http_date
 from django.views import View
-from django.core.cache import cache
+from django.views.decorators.http import condition, last_modified
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, PermissionRequiredMixin, UserPassesTestMixin
 from django.contrib.syndication.views import Feed
 from rest_framework.viewsets import ModelViewSet
-from rest_framework.filters import SearchFilter, OrderingFilter
+from rest_framework.filters import OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
+from drf_spectacular.utils import extend_schema, extend_schema_view
 from django.contrib.auth.models import User
 
-from .mixins import OwnerRequiredMixin
+from mysite.pagination import CountFreePageNumberPagination, KeysetPaginator, InvalidCursor
+from mysite.single_flight import aget_or_recompute, get_or_recompute
+
+from .caching import (USER_ORDERS_CACHE_TIMEOUT, aproducts_last_modified, format_product_etag, product_etag,
+                      product_last_modified, products_last_modified, user_orders_cache_key)
+from .export import EXPORT_FORMATS, iter_orders
+from .filters import OrderFilter, ProductSearchFilter
+from .mixins import AsyncLoginRequiredMixin, OwnerRequiredMixin
 from .models import Product, Order
-from .serializers import ProductSerializer, OrderSerializer
+from .pagination import OrderPagination, ProductPagination
+from .serializers import ProductSerializer, OrderReadSerializer, OrderSerializer
 
 
 def shop_index(request: HttpRequest):
@@ -27,14 +46,82 @@ class ProductsListView(ListView):
     template_name = 'shopapp/products.html'
     model = Product
     context_object_name = 'list_products'
+    paginate_by = 20
+    ordering = ('creation_date', 'pk')
 
+    def get_queryset(self):
+        return (
+            Product.objects
+            .filter(archived=False)
+            .only('pk', 'name', 'price', 'creation_date')
+        )
 
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, self.ordering, page_size)
+        try:
+            page = paginator.get_page(self.request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class AsyncProductsListView(View):
+    """
+    ProductsListView for mysite.asgi: the page is read with the async ORM and
+    only template rendering, whose context processors use the sync ORM, runs
+    in a thread.
+    """
+    template_name = ProductsListView.template_name
+    paginate_by = ProductsListView.paginate_by
+    ordering = ProductsListView.ordering
+    get_queryset = ProductsListView.get_queryset
+
+    async def get(self, request: HttpRequest) -> HttpResponse:
+        paginator = KeysetPaginator(self.get_queryset(), self.ordering, self.paginate_by)
+        try:
+            page = await paginator.aget_page(request.GET.get('cursor'))
+        except InvalidCursor as exc:
+            raise Http404(str(exc))
+        context = {
+            'list_products': page.object_list,
+            'page_obj': page,
+            'paginator': paginator,
+            'is_paginated': page.has_other_pages(),
+        }
+        return await sync_to_async(render)(request, self.template_name, context)
+
+
+@method_decorator(condition(etag_func=product_etag, last_modified_func=product_last_modified), name='dispatch')
 class ProductsDetailView(DetailView):
     template_name = 'shopapp/products_details.html'
     model = Product
     context_object_name = 'product'
 
 
+class AsyncProductsDetailView(View):
+    """
+    ProductsDetailView for mysite.asgi. It computes its ETag and
+    Last-Modified itself, because condition() calls its validators synchronously.
+    """
+    template_name = ProductsDetailView.template_name
+
+    async def get(self, request: HttpRequest, pk) -> HttpResponse:
+        product = await Product.objects.filter(pk=pk).afirst()
+        if product is None:
+            raise Http404('No product found matching the query')
+
+        etag = format_product_etag(
+            product.pk, product.modified_at, await request.auser(), getattr(request, 'LANGUAGE_CODE', ''),
+        )
+        last_modified = int(product.modified_at.timestamp())
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = await sync_to_async(render)(request, self.template_name, {'product': product})
+        response.headers.setdefault('ETag', etag)
+        response.headers.setdefault('Last-Modified', http_date(last_modified))
+        return response
+
+
 class ProductCreateView(LoginRequiredMixin, CreateView):
     model = Product
     fields = 'name', 'price', 'description', 'discount'
@@ -72,8 +159,15 @@ class ProductDeleteView(PermissionRequiredMixin, OwnerRequiredMixin, DeleteView)
 
 class OrdersListView(ListView):
     template_name = 'shopapp/orders.html'
-    model = Order
     context_object_name = 'orders'
+    paginate_by = 20
+    queryset = (
+        Order.objects
+        .select_related('user')
+        .only('pk', 'delivery_address', 'user__first_name', 'user__username')
+        .prefetch_related(Prefetch('products', queryset=Product.objects.only('pk', 'name')))
+        .order_by('-created_at', '-pk')
+    )
 
 
 class OrdersDetailView(PermissionRequiredMixin, DetailView):
@@ -121,60 +215,82 @@ class OrdersExportView(LoginRequiredMixin, UserPassesTestMixin, View):
     def test_func(self):
         return (self.request.user.is_staff == True)
 
-    def get(self, request: HttpRequest) -> JsonResponse:
-        orders = Order.objects.order_by('pk').all()
-        orders_data = [
-            {
-                'pk': order.pk,
-                'delivery_address': order.delivery_address,
-                'promo': order.promo,
-                'user': order.user.pk,
-                'products': [product.pk for product in order.products.all()],
-            }
-            for order in orders
-        ]
+    def get(self, request: HttpRequest) -> StreamingHttpResponse:
+        export_format = request.GET.get('format', 'json')
+        if export_format not in EXPORT_FORMATS:
+            # Don't echo the parameter back, it is user input.
+            return HttpResponseBadRequest(
+                f'Unknown export format, expected one of: {", ".join(EXPORT_FORMATS)}',
+                content_type='text/plain',
+            )
 
-        return JsonResponse({'orders': orders_data})
+        stream, content_type = EXPORT_FORMATS[export_format]
+        response = StreamingHttpResponse(stream(iter_orders()), content_type=content_type)
+        if export_format != 'json':
+            response['Content-Disposition'] = f'attachment; filename="orders.{export_format}"'
+        return response
 
 
 class ProductListViewWithSerializer(ModelViewSet):
     queryset = Product.objects.all()
     serializer_class = ProductSerializer
+    pagination_class = ProductPagination
+    search_pagination_class = CountFreePageNumberPagination
     filter_backends = [
-        SearchFilter,
+        ProductSearchFilter,
         OrderingFilter
     ]
-    search_fields = [
-        'name',
-        'description',
-        'price',
-    ]
-    ordering_fileds = [
+    # Keyset pages can't seek on the nullable description.
+    ordering_fields = [
         'pk',
         'name',
-        'description',
         'price',
+        'creation_date',
     ]
 
-
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            searching = self.request is not None and self.request.query_params.get(ProductSearchFilter.search_param)
+            # Search results are ordered by relevance, which has no column to seek on.
+            pagination_class = self.search_pagination_class if searching else self.pagination_class
+            self._paginator = pagination_class()
+        return self._paginator
+
+
+@extend_schema_view(
+    # Same output as OrderSerializer, which the schema generator can introspect.
+    list=extend_schema(responses=OrderSerializer(many=True)),
+    retrieve=extend_schema(responses=OrderSerializer),
+)
 class OrderListViewWithSerializer(ModelViewSet):
-    queryset = Order.objects.all()
+    queryset = Order.objects.order_by('pk')
     serializer_class = OrderSerializer
+    pagination_class = OrderPagination
     filter_backends = [
         DjangoFilterBackend,
         OrderingFilter
     ]
-    filterset_fields = [
-        'delivery_address',
-        'user',
-        'products',
-    ]
+    filterset_class = OrderFilter
     ordering_fields = [
         'pk',
         'created_at',
         'user',
+        'total_amount',
+        'item_count',
     ]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.only(*OrderReadSerializer.columns)
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return OrderReadSerializer
+        return OrderSerializer
+
 
 class LatestProductsFeed(Feed):
     title = 'Latest Products'
@@ -182,13 +298,56 @@ class LatestProductsFeed(Feed):
     link = reverse_lazy('shopapp:products')
 
     def items(self):
-        return Product.objects.filter(archived__isnull=False).order_by('-creation_date')[:5]
+        return (
+            Product.objects
+            .filter(archived=False)
+            .only('pk', 'name', 'description', 'modified_at')
+            .order_by('-creation_date')[:5]
+        )
 
     def item_title(self, item: Product):
         return item.name
 
     def item_description(self, item: Product):
-        return item.description[:30]
+        return (item.description or '')[:30]
+
+    def item_updateddate(self, item: Product):
+        return item.modified_at
+
+
+@last_modified(products_last_modified)
+def latest_products_feed(request: HttpRequest) -> HttpResponse:
+    response = LatestProductsFeed()(request)
+    # The feed dates itself by its newest item, which misses deletes and archives.
+    del response.headers['Last-Modified']
+    return response
+
+
+class PreloadedProductsFeed(LatestProductsFeed):
+
+    def get_object(self, request, items):
+        # Loaded by async_latest_products_feed() with the async ORM.
+        return items
+
+    def items(self, items):
+        return items
+
+
+async def async_latest_products_feed(request: HttpRequest) -> HttpResponse:
+    """
+    LatestProductsFeed for mysite.asgi.
+    """
+    last_modified = await aproducts_last_modified()
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(request, last_modified=timestamp)
+
+    if response is None:
+        items = [product async for product in LatestProductsFeed().items()]
+        # Building the feed from loaded items needs no further queries.
+        response = PreloadedProductsFeed()(request, items=items)
+    if timestamp:
+        response.headers['Last-Modified'] = http_date(timestamp)
+    return response
 
 
 class UserOrdersListView(LoginRequiredMixin, ListView):
@@ -213,27 +372,66 @@ class UserOrdersListView(LoginRequiredMixin, ListView):
         return context
 
 
-class UserOrdersExportView(LoginRequiredMixin, View):
+def orders_export(orders):
+    """
+    ETag and JSON content of a user's orders export.
+    """
+    content = json.dumps(
+        {'orders': OrderSerializer(orders, many=True).data},
+        cls=DjangoJSONEncoder,
+    ).encode()
+    return f'"{hashlib.md5(content).hexdigest()}"', content
 
-    def get(self, request: HttpRequest, user_id) -> JsonResponse:
 
-        cache_key = f'orders_data_{user_id}'
+class UserOrdersExportView(LoginRequiredMixin, View):
 
-        orders_data = cache.get(cache_key)
+    def get(self, request: HttpRequest, user_id) -> HttpResponse:
 
-        if orders_data is None:
+        def build():
             user = get_object_or_404(User, pk=user_id)
 
             orders = (
                 Order.objects
-                .select_related('user')
-                .prefetch_related('products')
+                .prefetch_related(Prefetch('products', queryset=Product.objects.only('pk')))
                 .filter(user=user)
                 .order_by('pk')
             )
 
-            orders_data = OrderSerializer(orders, many=True)
+            return orders_export(orders)
+
+        # Only one worker rebuilds an expired export, the others serve the previous one.
+        cached = get_or_recompute(user_orders_cache_key(user_id), build, USER_ORDERS_CACHE_TIMEOUT)
+
+        etag, content = cached
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)
+
+
+class AsyncUserOrdersExportView(AsyncLoginRequiredMixin, View):
+    """
+    UserOrdersExportView for mysite.asgi.
+    """
+
+    async def get(self, request: HttpRequest, user_id) -> HttpResponse:
+
+        async def build():
+            if not await User.objects.filter(pk=user_id).aexists():
+                raise Http404('No user found matching the query')
+
+            orders = [
+                order async for order in
+                Order.objects
+                .prefetch_related(Prefetch('products', queryset=Product.objects.only('pk')))
+                .filter(user_id=user_id)
+                .order_by('pk')
+            ]
+
+            return orders_export(orders)
 
-            cache.set(cache_key, orders_data, 180)
+        # Only one worker rebuilds an expired export, the others serve the previous one.
+        etag, content = await aget_or_recompute(user_orders_cache_key(user_id), build, USER_ORDERS_CACHE_TIMEOUT)
 
-        return JsonResponse({'orders': orders_data.data})
+        response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        return get_conditional_response(request, etag=etag, response=response)